@@ -0,0 +1,196 @@
+import array
+import operator
+
+import dnd.nodes as _node
+import dnd.rng
+import dnd.roll
+import dnd.token as _token
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Optional, Tuple, Union  # noqa: F401
+
+    Constant = Union[int, float, dnd.roll.Dice]
+
+# Programs are flat arrays of instructions in postfix order. The opcode of an
+# instruction is the id of the token it was assembled from; Int, Float and
+# Dice instructions are followed by the index of their operand in the table
+# of constants, while operators take their operands from the stack.
+_binary = {
+    _token.Add: operator.add,
+    _token.Subtract: operator.sub,
+    _token.Multiply: operator.mul,
+    _token.Divide: operator.truediv,
+    _token.FloorDiv: operator.floordiv,
+    _token.Modulo: operator.mod,
+    _token.Power: operator.pow,
+}
+
+_tokens = {
+    _node.Add: _token.Add,
+    _node.Subtract: _token.Subtract,
+    _node.Multiply: _token.Multiply,
+    _node.Divide: _token.Divide,
+    _node.FloorDiv: _token.FloorDiv,
+    _node.Modulo: _token.Modulo,
+    _node.Power: _token.Power,
+}
+
+
+class Program(object):
+    """Program is an expression compiled to flat postfix bytecode
+
+    Programs are evaluated by an iterative stack machine, so they can
+    evaluate expressions which are too deep to evaluate as a tree. They hold
+    only an array of instructions and a tuple of constants, so they are
+    small and cheap to pickle.
+    """
+
+    __slots__ = ("_code", "_constants", "_depth")
+
+    def __init__(
+        self, code: "array.array", constants: "Tuple[Constant, ...]", depth: "int"
+    ) -> None:
+        """Create a program from assembled bytecode
+
+        :param code: The instructions of the program
+        :param constants: The operands of the Int, Float and Dice instructions
+        :param depth: The largest number of values on the stack
+        """
+        self._code = code
+        self._constants = constants
+        self._depth = depth
+
+    @property
+    def code(self) -> "array.array":
+        return self._code
+
+    @property
+    def constants(self) -> "Tuple[Constant, ...]":
+        return self._constants
+
+    @property
+    def depth(self) -> "int":
+        return self._depth
+
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[float, int]":
+        if rng is None:
+            rng = dnd.rng.default
+        code, constants = self._code, self._constants
+        stack = list()  # type: List[Union[float, int]]
+        push, pop = stack.append, stack.pop
+        idx, end = 0, len(code)
+        while idx < end:
+            op = code[idx]
+            if op == _token.Int or op == _token.Float:
+                push(constants[code[idx + 1]])
+                idx += 2
+            elif op == _token.Dice:
+                dice = constants[code[idx + 1]]
+                draws = rng.randints(1, dice.sides, dice.count)
+                if dice.droplow > 0 or dice.drophigh > 0:
+                    draws.sort()
+                    draws = draws[dice.droplow : max(dice.count - dice.drophigh, 0)]
+                push(sum(draws))
+                idx += 2
+            elif op == _token.UnaryMinus:
+                stack[-1] = -stack[-1]
+                idx += 1
+            else:
+                rhs = pop()
+                stack[-1] = _binary[op](stack[-1], rhs)
+                idx += 1
+        return stack[0]
+
+    def __len__(self) -> "int":
+        return len(self._code)
+
+    def __repr__(self) -> "str":
+        return "Program({}, {}, {})".format(
+            repr(self._code), repr(self._constants), self._depth
+        )
+
+    def __str__(self) -> "str":
+        parts = list()
+        code, idx = self._code, 0
+        while idx < len(code):
+            op = code[idx]
+            if op == _token.Int or op == _token.Float or op == _token.Dice:
+                parts.append(str(self._constants[code[idx + 1]]))
+                idx += 2
+            else:
+                parts.append("neg" if op == _token.UnaryMinus else _token.Values[op])
+                idx += 1
+        return " ".join(parts)
+
+
+def assemble(tokens: "Iterable[Tuple[int, Optional[Constant]]]") -> "Program":
+    """Assemble a sequence of tokens in postfix order into a Program
+
+    :param tokens: The tokens of an expression in postfix order
+    :returns: The assembled program
+    :raises ValueError: If an operator is missing an operand, or the tokens
+                        do not leave exactly one value on the stack
+    """
+    code = array.array("i")
+    constants = list()  # type: List[Constant]
+    index = dict()  # type: Dict[Tuple[int, object], int]
+    depth = maxdepth = 0
+    for op, value in tokens:
+        if op == _token.Int or op == _token.Float or op == _token.Dice:
+            if op == _token.Dice:
+                key = (op, value)  # type: Tuple[int, object]
+            else:
+                key = (op, _node.valuekey(value))
+            at = index.get(key, None)
+            if at is None:
+                at = index[key] = len(constants)
+                constants.append(value)
+            code.append(op)
+            code.append(at)
+            depth += 1
+            maxdepth = max(depth, maxdepth)
+        else:
+            arity = 1 if op == _token.UnaryMinus else 2
+            if depth < arity:
+                raise ValueError("missing operand for '{}'".format(_token.Values[op]))
+            code.append(op)
+            depth -= arity - 1
+    if depth == 0:
+        raise ValueError("empty expression")
+    if depth > 1:
+        raise ValueError("parsing error: more than one node at root")
+    return Program(code, tuple(constants), maxdepth)
+
+
+def _postfix(node) -> "Iterable[Tuple[int, Optional[Constant]]]":
+    stack = [(node, False)]
+    while len(stack) > 0:
+        n, expanded = stack.pop()
+        t = type(n)
+        if t is _node.Value:
+            yield (_token.Int if type(n.value) is int else _token.Float), n.value
+        elif t is _node.Dice:
+            yield _token.Dice, n.dice
+        elif expanded:
+            yield (_token.UnaryMinus if t is _node.Negative else _tokens[t]), None
+        elif t is _node.Negative:
+            stack.append((n, True))
+            stack.append((n.value, False))
+        elif t in _tokens:
+            stack.append((n, True))
+            stack.append((n.rhs, False))
+            stack.append((n.lhs, False))
+        else:
+            raise ValueError("cannot assemble {}".format(repr(n)))
+
+
+def flatten(node) -> "Program":
+    """Assemble an expression tree, such as a simplified tree, into a Program
+
+    :param node: The root of the tree
+    :returns: The assembled program
+    :raises ValueError: If the tree contains a node which is not an expression
+    """
+    return assemble(_postfix(node))
@@ -0,0 +1,110 @@
+import weakref
+
+import dnd.nodes as _node
+import dnd.rng
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Optional, Tuple, Union  # noqa: F401
+
+    Compiled = Callable[[Optional[dnd.rng.Source]], Union[float, int]]
+
+_operators = {
+    _node.Add: "+",
+    _node.Subtract: "-",
+    _node.Multiply: "*",
+    _node.Divide: "/",
+    _node.FloorDiv: "//",
+    _node.Modulo: "%",
+    _node.Power: "**",
+}
+
+_leaves = (_node.Value, _node.Dice, _node.Negative)
+
+# Compiled functions by the id of their root node. The functions are kept
+# out of the nodes so that trees can still be pickled, and each entry is
+# dropped when its node is collected.
+_compiled = dict()  # type: Dict[int, Tuple[weakref.ref, Compiled]]
+
+
+def _bind(value: "Any", names: "Dict[str, Any]") -> "str":
+    name = "_c{}".format(len(names))
+    names[name] = value
+    return name
+
+
+def _emit(node, names: "Dict[str, Any]") -> "str":
+    t = type(node)
+    if t is _node.Value:
+        if type(node.value) is int:
+            return repr(node.value) if node.value >= 0 else "({})".format(node.value)
+        return _bind(node.value, names)
+    if t is _node.Dice:
+        dice = node.dice
+        if dice.count == 0:
+            return "0"
+        draw = "rng.randints(1, {}, {})".format(dice.sides, dice.count)
+        if dice.droplow == 0 and dice.drophigh == 0:
+            return "sum({})".format(draw)
+        start = min(dice.droplow, dice.count)
+        end = max(dice.count - dice.drophigh, start)
+        return "sum(sorted({})[{}:{}])".format(draw, start, end)
+    if t is _node.Negative:
+        return "(-{})".format(_emit(node.value, names))
+    op = _operators.get(t, None)
+    if op is not None:
+        return "({} {} {})".format(_emit(node.lhs, names), op, _emit(node.rhs, names))
+    # Unknown nodes are called directly
+    return "{}(rng)".format(_bind(node, names))
+
+
+def source(node) -> "str":
+    """Get the Python source of the function an expression compiles to"""
+    return _source(node, dict())
+
+
+def _source(node, names: "Dict[str, Any]") -> "str":
+    return (
+        "def _compiled(rng=None):\n"
+        "    if rng is None:\n"
+        "        rng = _rng.default\n"
+        "    return {}\n"
+    ).format(_emit(node, names))
+
+
+def compile_node(node) -> "Compiled":
+    """Compile an expression tree into a single Python function
+
+    The function takes the same optional rng argument as the node and draws
+    from it in the same order, so for a given source of random numbers it
+    returns the same values as calling the node. Trees which are too deep
+    to compile are returned unchanged.
+
+    The result is cached for as long as the root node is alive, so compiling
+    a shared tree from the parse cache only happens once.
+
+    :param node: The root node of the expression
+    :returns: A callable which evaluates the expression
+    """
+    key = id(node)
+    entry = _compiled.get(key, None)
+    if entry is not None and entry[0]() is node:
+        return entry[1]
+
+    names = {"_rng": dnd.rng}
+    try:
+        code = compile(_source(node, names), "<expression>", "exec")
+    except (RecursionError, SyntaxError, MemoryError):
+        compiled = node
+    else:
+        exec(code, names)
+        compiled = names["_compiled"]
+
+    # Only functions which do not refer back to the root can be cached, or
+    # the cache would keep the root alive
+    t = type(node)
+    if compiled is not node and (t in _operators or t in _leaves):
+        ref = weakref.ref(node, lambda _: _compiled.pop(key, None))
+        _compiled[key] = (ref, compiled)
+    return compiled
@@ -0,0 +1,381 @@
+import fractions
+import functools
+import math
+import operator
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+    Number = Union[int, float]
+
+# The most pairs of outcomes combine will evaluate one at a time
+MaxPairs = 1 << 20
+
+
+class Distribution(object):
+    """Distribution is an exact discrete probability distribution
+
+    Each outcome is stored with an integer weight, so probabilities may be
+    computed exactly as a fraction of the total weight. Distributions are
+    shared by the caches in this module and must not be modified.
+    """
+
+    __slots__ = ("_weights", "_total")
+
+    def __init__(self, weights: "Dict[Number, int]") -> None:
+        """Create a distribution from a mapping of outcomes to weights
+
+        Outcomes with a weight of zero or less are discarded.
+
+        :param weights: The integer weight of each outcome
+        """
+        self._weights = dict(sorted((v, w) for v, w in weights.items() if w > 0))
+        self._total = sum(self._weights.values())
+        if self._total == 0:
+            raise ValueError("distribution must have at least one outcome")
+
+    @staticmethod
+    def constant(value: "Number") -> "Distribution":
+        return Distribution({value: 1})
+
+    @property
+    def total(self) -> "int":
+        return self._total
+
+    @property
+    def weights(self) -> "Dict[Number, int]":
+        return self._weights
+
+    def min(self) -> "Number":
+        return next(iter(self._weights))
+
+    def max(self) -> "Number":
+        return next(reversed(self._weights))
+
+    def mean(self) -> "float":
+        return sum(v * w for v, w in self._weights.items()) / self._total
+
+    def variance(self) -> "float":
+        mean = self.mean()
+        return sum((v - mean) ** 2 * w for v, w in self._weights.items()) / self._total
+
+    def probability(self, value: "Number") -> "float":
+        return self._weights.get(value, 0) / self._total
+
+    def fraction(self, value: "Number") -> "fractions.Fraction":
+        return fractions.Fraction(self._weights.get(value, 0), self._total)
+
+    def at_least(self, value: "Number") -> "float":
+        """Get the probability of an outcome greater than or equal to value"""
+        return sum(w for v, w in self._weights.items() if v >= value) / self._total
+
+    def at_most(self, value: "Number") -> "float":
+        """Get the probability of an outcome less than or equal to value"""
+        return sum(w for v, w in self._weights.items() if v <= value) / self._total
+
+    def items(self) -> "Iterator[Tuple[Number, float]]":
+        """Iterate over each outcome and its probability"""
+        total = self._total
+        return ((v, w / total) for v, w in self._weights.items())
+
+    def map(self, fn: "Callable[[Number], Number]") -> "Distribution":
+        """Get the distribution of fn applied to the outcomes"""
+        weights = dict()  # type: Dict[Number, int]
+        for v, w in self._weights.items():
+            v = fn(v)
+            weights[v] = weights.get(v, 0) + w
+        return Distribution(weights)
+
+    def __len__(self) -> "int":
+        return len(self._weights)
+
+    def __contains__(self, value: "Number") -> "bool":
+        return value in self._weights
+
+    def __getitem__(self, value: "Number") -> "float":
+        return self.probability(value)
+
+    def __iter__(self) -> "Iterator[Number]":
+        return iter(self._weights)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Distribution:
+            return NotImplemented
+        return self._weights == rhs._weights and self._total == rhs._total
+
+    def __repr__(self) -> "str":
+        return "Distribution({})".format(repr(self._weights))
+
+
+def _pack(counts: "List[int]", size: "int") -> "int":
+    """Pack a list of non-negative integers into a single integer
+
+    Each count occupies a fixed-width slot of the given number of bytes, so
+    that polynomial multiplication of the counts becomes one (Karatsuba)
+    integer multiplication as long as no coefficient overflows its slot.
+    """
+    data = b"".join(c.to_bytes(size, "little") for c in counts)
+    return int.from_bytes(data, "little")
+
+
+def _unpack(packed: "int", size: "int", n: "int") -> "List[int]":
+    """Unpack the lowest n integers packed by _pack"""
+    data = packed.to_bytes(max(n * size, (packed.bit_length() + 7) // 8), "little")
+    return [
+        int.from_bytes(data[i : i + size], "little") for i in range(0, n * size, size)
+    ]
+
+
+def _power(width: "int", n: "int") -> "List[int]":
+    """Count the sums of n dice with faces 0 to width - 1
+
+    These are the coefficients of P = (1 + x + ... + x**(width - 1))**n. As
+    P' * (1 - x) * (1 - x**width) = n * P * (1 - x**width - width * x**(width
+    - 1) * (1 - x)), each coefficient follows from the three before it at
+    offsets 1, width and width + 1, which takes O(n * width) operations
+    rather than the large multiplications of raising a packed polynomial to
+    a power.
+    """
+    length = n * (width - 1) + 1
+    coeffs = [0] * length
+    coeffs[0] = 1
+    for m in range(length - 1):
+        value = (m + n) * coeffs[m]
+        if m + 1 >= width:
+            value += (m + 1 - width - n * width) * coeffs[m + 1 - width]
+            if m >= width:
+                value += (n * (width - 1) - m + width) * coeffs[m - width]
+        coeffs[m + 1] = value // (m + 1)
+    return coeffs
+
+
+def _widen(coeffs: "List[int]", width: "int") -> "List[int]":
+    """Multiply the polynomial coeffs by 1 + x + ... + x**(width - 1)
+
+    Each coefficient of the product is the sum of a window of width
+    coefficients, which is kept as a running sum.
+    """
+    n = len(coeffs)
+    result = [0] * (n + width - 1)
+    window = 0
+    for k in range(n + width - 1):
+        if k < n:
+            window += coeffs[k]
+        if k >= width:
+            window -= coeffs[k - width]
+        result[k] = window
+    return result
+
+
+def _sweep(
+    count: "int", sides: "int", droplow: "int", drophigh: "int", size: "int"
+) -> "List[int]":
+    """Count the kept sums of dice by placing them in sorted order
+
+    The sorted order of the dice is built up one face at a time, tracking how
+    many dice have been placed and the packed sums of those which fall in the
+    kept range. This takes O(sides * count**2) operations on packed sums, so
+    it is only used for small pools.
+    """
+    bits = size * 8
+    kept = count - droplow - drophigh
+    keepend = count - drophigh
+    # polys[k] holds the packed sums of the kept dice once k dice are placed
+    polys = [0] * (count + 1)
+    polys[0] = 1
+    for face in range(1, sides + 1):
+        placed = [0] * (count + 1)
+        for k, poly in enumerate(polys):
+            if poly == 0:
+                continue
+            remaining = count - k
+            first = remaining if face == sides else 0
+            for j in range(first, remaining + 1):
+                keptj = max(0, min(k + j, keepend) - max(k, droplow))
+                shifted = poly << (bits * keptj * face)
+                placed[k + j] += math.comb(remaining, j) * shifted
+        polys = placed
+    return _unpack(polys[count], size, kept * sides + 1)
+
+
+def _thresholds(
+    count: "int", sides: "int", droplow: "int", drophigh: "int", size: "int"
+) -> "List[int]":
+    """Count the kept sums of dice by the values of the outermost kept dice
+
+    If a is between the highest low dropped die and the lowest kept die, and
+    b is between the highest kept die and the lowest high dropped die, then
+    clipping every die to [a, b] sums to the kept sum plus droplow * a +
+    drophigh * b. The clipped dice below and above the interval are counted
+    directly, and the dice inside it are a power of a single die. Counting
+    the a for which at most droplow dice are below a, less those for which
+    at most droplow dice are at or below a, counts each roll exactly once;
+    b is handled the same way.
+
+    This takes O(sides**2 * (droplow + 1) * (drophigh + 1)) passes over the
+    packed sums, whatever the number of dice, though the packed sums grow
+    with count**2 * sides * log(sides) bits.
+    """
+    bits = size * 8
+    kept = count - droplow - drophigh
+    fact = [1] * (count + 1)
+    for i in range(1, count + 1):
+        fact[i] = fact[i - 1] * i
+
+    # Each bound is (threshold, end of the interval, base, sign), where base is
+    # the number of faces a die outside the interval may have
+    lows = [(1, 1, 0, 1)]
+    if droplow > 0:
+        lows = [
+            (a, a + d, a - 1 + d, 1 - 2 * d)
+            for a in range(1, sides + 1)
+            for d in (0, 1)
+        ]
+    highs = [(sides, sides, 0, 1)]
+    if drophigh > 0:
+        highs = [
+            (b, b - d, sides - b + d, 1 - 2 * d)
+            for b in range(1, sides + 1)
+            for d in (0, 1)
+        ]
+    bywidth = dict()  # type: Dict[int, List[Tuple[tuple, tuple]]]
+    for low in lows:
+        for high in highs:
+            width = high[1] - low[1] + 1
+            if low[0] <= high[0] and width > 0:
+                bywidth.setdefault(width, []).append((low, high))
+
+    # Terms may have negative exponents before they cancel, so offset them
+    offset = drophigh * sides
+    total = 0
+    for width, bounds in bywidth.items():
+        # Terms which multiply the same power of the die by the same shift
+        # are merged, as each term costs a pass over the packed sums
+        terms = dict()  # type: Dict[Tuple[int, int], int]
+        for (a, lo, lbase, lsign), (b, _, hbase, hsign) in bounds:
+            for below in range(droplow + 1):
+                for above in range(drophigh + 1):
+                    inside = count - below - above
+                    ways = fact[count] // (fact[below] * fact[above] * fact[inside])
+                    ways *= lbase**below * hbase**above
+                    if ways == 0:
+                        continue
+                    clipped = a * (below - droplow) + b * (above - drophigh)
+                    key = (inside, clipped + inside * lo + offset)
+                    ways = ways if lsign == hsign else -ways
+                    terms[key] = terms.get(key, 0) + ways
+
+        # The powers of a die with faces 0 to width - 1 are found by widening
+        # the previous power, and only packed when a term uses them
+        bypower = dict()  # type: Dict[int, List[Tuple[int, int]]]
+        for (inside, shift), ways in terms.items():
+            if ways != 0:
+                bypower.setdefault(inside, []).append((shift, ways))
+        coeffs = _power(width, kept)
+        for inside in range(kept, count + 1):
+            if inside > kept:
+                coeffs = _widen(coeffs, width)
+            if inside in bypower:
+                power = _pack(coeffs, size)
+                for shift, ways in bypower[inside]:
+                    total += (ways * power) << (shift * bits)
+    return _unpack(total >> (offset * bits), size, kept * sides + 1)
+
+
+@functools.lru_cache(maxsize=256)
+def dice(count: "int", sides: "int", droplow: "int", drophigh: "int") -> "Distribution":
+    """Calculate the exact distribution of the result of rolling dice
+
+    Sums of dice without drops are counted directly by a recurrence. When
+    dice are dropped, the sums are counted either by placing the dice in
+    sorted order or by the values of the outermost kept dice, whichever takes
+    fewer steps; the latter scales to pools of hundreds of dice.
+
+    Pools such as 1000d6L10 or 200d20L1H1 take under a second. The time grows
+    with the square of the number of dice, and with the square of the number
+    of sides times the number of dropped dice, so that pools of d100 which
+    drop both low and high dice, such as 50d100L2H2, take tens of seconds.
+
+    :param count: The number of dice rolled
+    :param sides: The number of sides on each die
+    :param droplow: How many low values are dropped from the result
+    :param drophigh: How many high values are dropped from the result
+    :returns: The distribution of the result of the roll
+    """
+    kept = count - droplow - drophigh
+    if kept <= 0:
+        return Distribution({0: sides**count})
+
+    if droplow == 0 and drophigh == 0:
+        counts = _power(sides, count)
+        return Distribution({count + i: c for i, c in enumerate(counts)})
+
+    # Every coefficient is bounded by the total number of outcomes
+    size = ((sides**count).bit_length() + 8) // 8
+
+    lows = 2 * sides if droplow > 0 else 1
+    highs = 2 * sides if drophigh > 0 else 1
+    if droplow > 0 and drophigh > 0:
+        # Only thresholds with a <= b are counted
+        highs //= 2
+    steps = lows * highs * (droplow + 1) * (drophigh + 1)
+    if steps <= sides * count * count // 2:
+        counts = _thresholds(count, sides, droplow, drophigh, size)
+    else:
+        counts = _sweep(count, sides, droplow, drophigh, size)
+    return Distribution({i: c for i, c in enumerate(counts)})
+
+
+def _dense(dist: "Distribution") -> "bool":
+    if any(type(v) is not int for v in dist.weights):
+        return False
+    return dist.max() - dist.min() < 2 * len(dist) + 16
+
+
+def _convolve(lhs: "Distribution", rhs: "Distribution") -> "Distribution":
+    """Calculate the distribution of the sum of two integer distributions"""
+    size = ((lhs.total * rhs.total).bit_length() + 8) // 8
+    packed = []
+    for dist in (lhs, rhs):
+        lo = dist.min()
+        counts = [0] * (dist.max() - lo + 1)
+        for v, w in dist.weights.items():
+            counts[v - lo] = w
+        packed.append(_pack(counts, size))
+    lo = lhs.min() + rhs.min()
+    n = lhs.max() + rhs.max() - lo + 1
+    counts = _unpack(packed[0] * packed[1], size, n)
+    return Distribution({lo + i: c for i, c in enumerate(counts)})
+
+
+def combine(
+    op: "Callable[[Number, Number], Number]", lhs: "Distribution", rhs: "Distribution"
+) -> "Optional[Distribution]":
+    """Calculate the distribution of op applied to two independent outcomes
+
+    Sums and differences of integer distributions are convolved as packed
+    polynomials; any other operation is applied to every pair of outcomes.
+
+    :param op: The binary operation to apply to the outcomes
+    :param lhs: The distribution of the left operand
+    :param rhs: The distribution of the right operand
+    :returns: The combined distribution, or None if there are more than
+              MaxPairs pairs of outcomes to combine one at a time
+    :raises ArithmeticError: If op fails for any pair of outcomes
+    """
+    if op is operator.sub:
+        op, rhs = operator.add, rhs.map(operator.neg)
+    if op is operator.add and _dense(lhs) and _dense(rhs):
+        return _convolve(lhs, rhs)
+    if len(lhs) * len(rhs) > MaxPairs:
+        return None
+
+    weights = dict()  # type: Dict[Number, int]
+    ritems = list(rhs.weights.items())
+    for a, wa in lhs.weights.items():
+        for b, wb in ritems:
+            v = op(a, b)
+            weights[v] = weights.get(v, 0) + wa * wb
+    return Distribution(weights)
@@ -73,8 +73,10 @@ class Handler(object):
 
     def error_with(self, err: "str", key: "JsonPathElement") -> None:
         self.push(key)
-        self.error(err)
-        self.pop()
+        try:
+            self.error(err)
+        finally:
+            self.pop()
 
     def error(self, err: "Union[str,BaseException]") -> None:
         raise NotImplementedError()
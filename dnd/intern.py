@@ -0,0 +1,148 @@
+import sys
+import weakref
+
+import dnd.nodes as _node
+import dnd.roll
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, List  # noqa: F401
+
+_binary = (
+    _node.Add,
+    _node.Subtract,
+    _node.Multiply,
+    _node.Divide,
+    _node.FloorDiv,
+    _node.Modulo,
+    _node.Power,
+)
+
+
+def _children(node) -> "List":
+    t = type(node)
+    if t in _binary:
+        return [node.lhs, node.rhs]
+    if t is _node.Negative:
+        return [node.value]
+    return []
+
+
+class InternTable(object):
+    """InternTable shares one instance of every distinct expression subtree
+
+    Trees are interned bottom up, so the children of an interned node are
+    themselves interned and a node can be looked up by its type and the
+    identity of its children rather than by hashing the whole subtree.
+    Interned trees are shared by every expression which contains them, so
+    they must not be modified.
+
+    Entries are held weakly, and are dropped once no expression uses them.
+    """
+
+    def __init__(self) -> None:
+        self._entries = weakref.WeakValueDictionary()
+        self._hits = 0
+        self._misses = 0
+        self._saved = 0
+
+    @property
+    def hits(self) -> "int":
+        """The number of nodes which were replaced by a shared instance"""
+        return self._hits
+
+    @property
+    def misses(self) -> "int":
+        """The number of nodes which became the shared instance"""
+        return self._misses
+
+    @property
+    def saved(self) -> "int":
+        """The number of bytes of the nodes which were replaced"""
+        return self._saved
+
+    def dice(self, dice: "dnd.roll.Dice") -> "dnd.roll.Dice":
+        """Get the shared instance of a set of dice
+
+        :param dice: The dice to intern
+        :returns: The shared Dice equal to dice
+        """
+        key = (dnd.roll.Dice, dice.count, dice.sides, dice.droplow, dice.drophigh)
+        return self._lookup(key, dice)
+
+    def intern(self, node):
+        """Get the shared instance of an expression tree
+
+        :param node: The root of the tree to intern
+        :returns: The root of the shared tree equal to node
+        """
+        done = dict()  # type: Dict[int, object]
+        stack = [node]
+        while len(stack) > 0:
+            n = stack[-1]
+            children = _children(n)
+            pending = [c for c in children if id(c) not in done]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if id(n) not in done:
+                done[id(n)] = self._intern(n, [done[id(c)] for c in children])
+        return done[id(node)]
+
+    def _intern(self, node, children: "List"):
+        t = type(node)
+        if t is _node.Value:
+            key = (t, _node.valuekey(node.value))
+        elif t is _node.Dice:
+            dice = self.dice(node.dice)
+            if dice is not node.dice:
+                node = _node.Dice(dice)
+            key = (t, id(dice))
+        elif t is _node.Negative:
+            if children[0] is not node.value:
+                node = _node.Negative(children[0])
+            key = (t, id(children[0]))
+        elif t in _binary:
+            if children[0] is not node.lhs or children[1] is not node.rhs:
+                node = t(children[0], children[1])
+            key = (t, id(children[0]), id(children[1]))
+        else:
+            return node
+        return self._lookup(key, node)
+
+    def _lookup(self, key: "tuple", value):
+        # Keys hold the ids of interned children, which stay alive for as
+        # long as the entry does, so an id is never reused for a live key
+        shared = self._entries.get(key, None)
+        if shared is not None:
+            self._hits += 1
+            self._saved += sys.getsizeof(value)
+            return shared
+        self._misses += 1
+        self._entries[key] = value
+        return value
+
+    def clear(self) -> None:
+        """Forget every shared instance and reset the counters"""
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
+        self._saved = 0
+
+    def __len__(self) -> "int":
+        return len(self._entries)
+
+    def __repr__(self) -> "str":
+        return "InternTable(entries={}, hits={}, misses={}, saved={})".format(
+            len(self._entries), self._hits, self._misses, self._saved
+        )
+
+
+default = InternTable()
+
+
+def intern(node):
+    """Intern an expression tree in the default table"""
+    return default.intern(node)
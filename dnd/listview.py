@@ -1,28 +1,43 @@
+import itertools
+
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import List
+    from typing import Iterator, List, Sequence
 
 
 class ListView(object):
-    """ListView is an immutable view into a list of ints"""
+    """ListView is an immutable view into a sequence of ints
+
+    The view covers the positions [start, end) of the sequence and never
+    copies the underlying values.
+    """
+
+    __slots__ = ("_values", "_start", "_end")
 
-    def __init__(self, values: "List[int]", start: "int", end: "int") -> None:
+    def __init__(self, values: "Sequence[int]", start: "int", end: "int") -> None:
         self._values = values
         self._start = start
-        self._end = end
+        self._end = max(start, end)
 
     def __len__(self) -> "int":
-        return len(self._values) - (self._start + self._end)
+        return self._end - self._start
 
     def __getitem__(self, idx: "int") -> "int":
+        if idx < 0:
+            idx += self._end - self._start
+        if idx < 0 or idx >= self._end - self._start:
+            raise IndexError("view index out of range")
         return self._values[self._start + idx]
 
-    def __contains__(self, value: "int") -> "int":
-        return value in self._values[self._start : self._end]
+    def __contains__(self, value: "int") -> "bool":
+        for v in self:
+            if v == value:
+                return True
+        return False
 
-    def __iter__(self):
-        return (i for i in self._values[self._start : self._end])
+    def __iter__(self) -> "Iterator[int]":
+        return itertools.islice(self._values, self._start, self._end)
 
     def __repr__(self) -> "str":
         return "ListView({}, {}, {})".format(
@@ -30,4 +45,56 @@ class ListView(object):
         )
 
     def __str__(self) -> "str":
-        return repr(self._values[self._start : self._end])
+        return repr(list(self))
+
+
+class HistogramView(object):
+    """HistogramView is an immutable view into sorted values stored as counts
+
+    The values are never materialized; counts[i] is the number of times the
+    value i + 1 occurs, and the view covers the positions [start, end) of the
+    sorted sequence described by the counts.
+    """
+
+    __slots__ = ("_counts", "_start", "_end")
+
+    def __init__(self, counts: "List[int]", start: "int", end: "int") -> None:
+        self._counts = counts
+        self._start = start
+        self._end = max(start, end)
+
+    def __len__(self) -> "int":
+        return self._end - self._start
+
+    def __getitem__(self, idx: "int") -> "int":
+        if idx < 0:
+            idx += self._end - self._start
+        if idx < 0 or idx >= self._end - self._start:
+            raise IndexError("view index out of range")
+        pos = self._start + idx
+        for value, count in enumerate(self._counts, 1):
+            if pos < count:
+                return value
+            pos -= count
+        raise IndexError("view index out of range")
+
+    def __contains__(self, value: "int") -> "bool":
+        if type(value) is not int or value < 1 or value > len(self._counts):
+            return False
+        first = sum(self._counts[: value - 1])
+        last = first + self._counts[value - 1]
+        return max(first, self._start) < min(last, self._end)
+
+    def __iter__(self) -> "Iterator[int]":
+        runs = (itertools.repeat(v, c) for v, c in enumerate(self._counts, 1))
+        return itertools.islice(
+            itertools.chain.from_iterable(runs), self._start, self._end
+        )
+
+    def __repr__(self) -> "str":
+        return "HistogramView({}, {}, {})".format(
+            repr(self._counts), repr(self._start), repr(self._end)
+        )
+
+    def __str__(self) -> "str":
+        return repr(list(self))
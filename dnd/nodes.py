@@ -1,7 +1,15 @@
+import collections
+import functools
+import math
+import operator
+
+import dnd.dist
+
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Union
+    from typing import Iterable, List, Optional, Tuple, Union
+    import dnd.rng
     import dnd.roll
 
 
@@ -17,8 +25,74 @@ def nodestr(node, parent_precedence: "int") -> "str":
     return str(node)
 
 
+# Every node provides min, max, mean and variance. The mean and variance have
+# a closed form for Value, Dice, Add, Subtract, Negative and Multiply, as
+# every node rolls its dice independently, and for Divide by a constant. The
+# remaining operations only have a closed form when both operands are
+# constant, and otherwise use the exact distribution of the node. min and max
+# are exact for the monotonic operations and are bounds for FloorDiv, Modulo
+# and Power; dividing by a range which contains zero is unbounded.
+def constant(node) -> "Optional[Union[float, int]]":
+    """Get the value of a node if it always evaluates to the same value"""
+    lo = node.min()
+    if lo == node.max():
+        return lo
+    return None
+
+
+def _bounds(values: "Iterable[Union[float, int]]") -> "Tuple[float, float]":
+    values = list(values)
+    return min(values), max(values)
+
+
+# evaluate_batch(n, rng) returns n independent samples of a node as a list.
+# Every Dice node draws all of its dice in one call and operators combine
+# the samples of their operands elementwise, so the draws are made in a
+# different order than n calls of the node would make them.
+def _batch(op, node, n: "int", rng: "Optional[dnd.rng.Source]") -> "List":
+    lhs = node.lhs.evaluate_batch(n, rng)
+    return list(map(op, lhs, node.rhs.evaluate_batch(n, rng)))
+
+
+# distribution() propagates exact distributions through the tree. Operands
+# are rolled independently, so the distribution of an operator is found by
+# applying it to every pair of outcomes of its operands. An operator whose
+# operands have too many pairs of outcomes falls back to the distribution of
+# DistributionSamples samples. Results are cached by the structure of the
+# node, so every tree equal to a node shares its distribution.
+DistributionSamples = 100000
+
+
+@functools.lru_cache(maxsize=256)
+def _distribution(op, node) -> "dnd.dist.Distribution":
+    try:
+        if op is operator.neg:
+            return node.value.distribution().map(op)
+        lhs, rhs = node.lhs.distribution(), node.rhs.distribution()
+        result = dnd.dist.combine(op, lhs, rhs)
+        if result is None:
+            samples = node.evaluate_batch(DistributionSamples)
+            result = dnd.dist.Distribution(collections.Counter(samples))
+        return result
+    except ArithmeticError as e:
+        raise ValueError("the distribution of {} is undefined: {}".format(node, e))
+
+
+# Nodes compare and hash by structure, so that identical subtrees can be
+# shared; see dnd.intern
+def valuekey(value: "Union[float, int]") -> "Tuple[type, object]":
+    """Get a key which identifies a constant by its type and exact value
+
+    Floats are keyed by their repr, so that 0.0 and -0.0 differ and nan is
+    equal to itself.
+    """
+    if type(value) is float:
+        return float, repr(value)
+    return type(value), value
+
+
 class Value(object):
-    __slots__ = ("value",)
+    __slots__ = ("value", "__weakref__")
 
     def __init__(self, value: "Union[float, int]") -> None:
         self.value = value
@@ -26,9 +100,37 @@ class Value(object):
     def precedence(self) -> int:
         return PrecedenceValue
 
-    def __call__(self) -> "Union[float, int]":
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[float, int]":
+        return self.value
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return [self.value] * max(n, 0)
+
+    def min(self) -> "Union[float, int]":
+        return self.value
+
+    def max(self) -> "Union[float, int]":
+        return self.value
+
+    def mean(self) -> "Union[float, int]":
         return self.value
 
+    def variance(self) -> "float":
+        return 0
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return dnd.dist.Distribution.constant(self.value)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Value:
+            return NotImplemented
+        return valuekey(self.value) == valuekey(rhs.value)
+
+    def __hash__(self) -> "int":
+        return hash((Value, valuekey(self.value)))
+
     def __repr__(self) -> "str":
         return "Value({})".format(self.value)
 
@@ -37,7 +139,7 @@ class Value(object):
 
 
 class Dice(object):
-    __slots__ = ("dice",)
+    __slots__ = ("dice", "__weakref__")
 
     def __init__(self, value: "dnd.roll.Dice") -> None:
         self.dice = value
@@ -45,8 +147,36 @@ class Dice(object):
     def precedence(self) -> int:
         return PrecedenceValue
 
-    def __call__(self) -> "int":
-        return self.dice.roll().result
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "int":
+        return self.dice.roll(rng).result
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[int]":
+        return list(self.dice.roll_many(n, rng=rng).totals)
+
+    def min(self) -> "int":
+        return self.dice.min()
+
+    def max(self) -> "int":
+        return self.dice.max()
+
+    def mean(self) -> "float":
+        return self.dice.mean()
+
+    def variance(self) -> "float":
+        return self.dice.variance()
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return self.dice.distribution()
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Dice:
+            return NotImplemented
+        return self.dice == rhs.dice
+
+    def __hash__(self) -> "int":
+        return hash((Dice, self.dice))
 
     def __repr__(self) -> "str":
         return repr(self.dice)
@@ -56,7 +186,7 @@ class Dice(object):
 
 
 class Add(object):
-    __slots__ = ("lhs", "rhs")
+    __slots__ = ("lhs", "rhs", "__weakref__")
 
     def __init__(self, lhs, rhs) -> None:
         self.lhs = lhs
@@ -65,8 +195,36 @@ class Add(object):
     def precedence(self) -> int:
         return PrecedenceAddSub
 
-    def __call__(self) -> "Union[float, int]":
-        return self.lhs() + self.rhs()
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[float, int]":
+        return self.lhs(rng) + self.rhs(rng)
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return _batch(operator.add, self, n, rng)
+
+    def min(self) -> "Union[float, int]":
+        return self.lhs.min() + self.rhs.min()
+
+    def max(self) -> "Union[float, int]":
+        return self.lhs.max() + self.rhs.max()
+
+    def mean(self) -> "float":
+        return self.lhs.mean() + self.rhs.mean()
+
+    def variance(self) -> "float":
+        return self.lhs.variance() + self.rhs.variance()
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.add, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Add:
+            return NotImplemented
+        return self.lhs == rhs.lhs and self.rhs == rhs.rhs
+
+    def __hash__(self) -> "int":
+        return hash((Add, self.lhs, self.rhs))
 
     def __repr__(self) -> "str":
         return "Add({}, {})".format(repr(self.lhs), repr(self.rhs))
@@ -78,26 +236,58 @@ class Add(object):
 
 
 class Subtract(object):
-    __slots__ = ("lhs", "rhs")
+    __slots__ = ("lhs", "rhs", "__weakref__")
 
     def __init__(self, lhs, rhs) -> None:
         self.lhs = lhs
         self.rhs = rhs
 
-    def __call__(self) -> "Union[float, int]":
-        return self.lhs() - self.rhs()
+    def precedence(self) -> int:
+        return PrecedenceAddSub
+
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[float, int]":
+        return self.lhs(rng) - self.rhs(rng)
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return _batch(operator.sub, self, n, rng)
+
+    def min(self) -> "Union[float, int]":
+        return self.lhs.min() - self.rhs.max()
+
+    def max(self) -> "Union[float, int]":
+        return self.lhs.max() - self.rhs.min()
+
+    def mean(self) -> "float":
+        return self.lhs.mean() - self.rhs.mean()
+
+    def variance(self) -> "float":
+        return self.lhs.variance() + self.rhs.variance()
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.sub, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Subtract:
+            return NotImplemented
+        return self.lhs == rhs.lhs and self.rhs == rhs.rhs
+
+    def __hash__(self) -> "int":
+        return hash((Subtract, self.lhs, self.rhs))
 
     def __repr__(self) -> "str":
         return "Subtract({}, {})".format(repr(self.lhs), repr(self.rhs))
 
     def __str__(self) -> "str":
         return "{} - {}".format(
-            nodestr(self.lhs, PrecedenceAddSub), nodestr(self.rhs, PrecedenceAddSub)
+            nodestr(self.lhs, PrecedenceAddSub),
+            nodestr(self.rhs, PrecedenceAddSub + 1),
         )
 
 
 class Negative(object):
-    __slots__ = ("value",)
+    __slots__ = ("value", "__weakref__")
 
     def __init__(self, value) -> None:
         self.value = value
@@ -105,14 +295,42 @@ class Negative(object):
     def precedence(self) -> int:
         return PrecedenceValue
 
-    def __call__(self) -> "Union[float, int]":
-        return -(self.value())
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[float, int]":
+        return -(self.value(rng))
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return list(map(operator.neg, self.value.evaluate_batch(n, rng)))
+
+    def min(self) -> "Union[float, int]":
+        return -self.value.max()
+
+    def max(self) -> "Union[float, int]":
+        return -self.value.min()
+
+    def mean(self) -> "float":
+        return -self.value.mean()
+
+    def variance(self) -> "float":
+        return self.value.variance()
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.neg, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Negative:
+            return NotImplemented
+        return self.value == rhs.value
+
+    def __hash__(self) -> "int":
+        return hash((Negative, self.value))
 
     def __repr__(self) -> "str":
         return "Negative({})".format(repr(self.value))
 
     def __str__(self) -> "str":
-        if self.value.precedence == PrecedenceValue:
+        if self.value.precedence() == PrecedenceValue:
             if type(self.value) is Dice:
                 return "-({})".format(self.value)
             return "-{}".format(self.value)
@@ -120,7 +338,7 @@ class Negative(object):
 
 
 class Multiply(object):
-    __slots__ = ("lhs", "rhs")
+    __slots__ = ("lhs", "rhs", "__weakref__")
 
     def __init__(self, lhs, rhs) -> None:
         self.lhs = lhs
@@ -129,8 +347,43 @@ class Multiply(object):
     def precedence(self) -> "int":
         return PrecedenceMulDiv
 
-    def __call__(self) -> "Union[float, int]":
-        return self.lhs() * self.rhs()
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[float, int]":
+        return self.lhs(rng) * self.rhs(rng)
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return _batch(operator.mul, self, n, rng)
+
+    def _range(self) -> "Tuple[float, float]":
+        lmin, lmax = self.lhs.min(), self.lhs.max()
+        rmin, rmax = self.rhs.min(), self.rhs.max()
+        return _bounds((lmin * rmin, lmin * rmax, lmax * rmin, lmax * rmax))
+
+    def min(self) -> "Union[float, int]":
+        return self._range()[0]
+
+    def max(self) -> "Union[float, int]":
+        return self._range()[1]
+
+    def mean(self) -> "float":
+        return self.lhs.mean() * self.rhs.mean()
+
+    def variance(self) -> "float":
+        lmean, lvar = self.lhs.mean(), self.lhs.variance()
+        rmean, rvar = self.rhs.mean(), self.rhs.variance()
+        return lvar * rvar + lvar * rmean * rmean + rvar * lmean * lmean
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.mul, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Multiply:
+            return NotImplemented
+        return self.lhs == rhs.lhs and self.rhs == rhs.rhs
+
+    def __hash__(self) -> "int":
+        return hash((Multiply, self.lhs, self.rhs))
 
     def __repr__(self) -> "str":
         return "Multiply({}, {})".format(repr(self.lhs), repr(self.rhs))
@@ -142,7 +395,7 @@ class Multiply(object):
 
 
 class Divide(object):
-    __slots__ = ("lhs", "rhs")
+    __slots__ = ("lhs", "rhs", "__weakref__")
 
     def __init__(self, lhs, rhs) -> None:
         self.lhs = lhs
@@ -151,20 +404,62 @@ class Divide(object):
     def precedence(self) -> "int":
         return PrecedenceMulDiv
 
-    def __call__(self) -> "Union[float, int]":
-        return self.lhs() / self.rhs()
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[float, int]":
+        return self.lhs(rng) / self.rhs(rng)
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return _batch(operator.truediv, self, n, rng)
+
+    def _range(self) -> "Tuple[float, float]":
+        lmin, lmax = self.lhs.min(), self.lhs.max()
+        rmin, rmax = self.rhs.min(), self.rhs.max()
+        if rmin <= 0 <= rmax:
+            return -math.inf, math.inf
+        return _bounds((lmin / rmin, lmin / rmax, lmax / rmin, lmax / rmax))
+
+    def min(self) -> "float":
+        return self._range()[0]
+
+    def max(self) -> "float":
+        return self._range()[1]
+
+    def mean(self) -> "float":
+        rhs = constant(self.rhs)
+        if rhs is None:
+            return self.distribution().mean()
+        return self.lhs.mean() / rhs
+
+    def variance(self) -> "float":
+        rhs = constant(self.rhs)
+        if rhs is None:
+            return self.distribution().variance()
+        return self.lhs.variance() / (rhs * rhs)
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.truediv, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Divide:
+            return NotImplemented
+        return self.lhs == rhs.lhs and self.rhs == rhs.rhs
+
+    def __hash__(self) -> "int":
+        return hash((Divide, self.lhs, self.rhs))
 
     def __repr__(self) -> "str":
         return "Divide({}, {})".format(repr(self.lhs), repr(self.rhs))
 
     def __str__(self) -> "str":
         return "{} / {}".format(
-            nodestr(self.lhs, PrecedenceMulDiv), nodestr(self.rhs, PrecedenceMulDiv)
+            nodestr(self.lhs, PrecedenceMulDiv),
+            nodestr(self.rhs, PrecedenceMulDiv + 1),
         )
 
 
 class FloorDiv(object):
-    __slots__ = ("lhs", "rhs")
+    __slots__ = ("lhs", "rhs", "__weakref__")
 
     def __init__(self, lhs, rhs) -> None:
         self.lhs = lhs
@@ -173,20 +468,61 @@ class FloorDiv(object):
     def precedence(self) -> "int":
         return PrecedenceMulDiv
 
-    def __call__(self) -> "int":
-        return self.lhs() // self.rhs()
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "int":
+        return self.lhs(rng) // self.rhs(rng)
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return _batch(operator.floordiv, self, n, rng)
+
+    def _range(self) -> "Tuple[float, float]":
+        lmin, lmax = self.lhs.min(), self.lhs.max()
+        rmin, rmax = self.rhs.min(), self.rhs.max()
+        if rmin <= 0 <= rmax:
+            return -math.inf, math.inf
+        return _bounds((lmin // rmin, lmin // rmax, lmax // rmin, lmax // rmax))
+
+    def min(self) -> "Union[float, int]":
+        return self._range()[0]
+
+    def max(self) -> "Union[float, int]":
+        return self._range()[1]
+
+    def mean(self) -> "float":
+        lhs, rhs = constant(self.lhs), constant(self.rhs)
+        if lhs is None or rhs is None:
+            return self.distribution().mean()
+        return lhs // rhs
+
+    def variance(self) -> "float":
+        if constant(self.lhs) is None or constant(self.rhs) is None:
+            return self.distribution().variance()
+        return 0
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.floordiv, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not FloorDiv:
+            return NotImplemented
+        return self.lhs == rhs.lhs and self.rhs == rhs.rhs
+
+    def __hash__(self) -> "int":
+        return hash((FloorDiv, self.lhs, self.rhs))
 
     def __repr__(self) -> "str":
         return "FloorDiv({}, {})".format(repr(self.lhs), repr(self.rhs))
 
     def __str__(self) -> "str":
         return "{} // {}".format(
-            nodestr(self.lhs, PrecedenceMulDiv), nodestr(self.rhs, PrecedenceMulDiv)
+            nodestr(self.lhs, PrecedenceMulDiv),
+            nodestr(self.rhs, PrecedenceMulDiv + 1),
         )
 
 
 class Power(object):
-    __slots__ = ("lhs", "rhs")
+    __slots__ = ("lhs", "rhs", "__weakref__")
 
     def __init__(self, lhs, rhs) -> None:
         self.lhs = lhs
@@ -195,20 +531,74 @@ class Power(object):
     def precedence(self) -> "int":
         return PrecedencePower
 
-    def __call__(self) -> "Union[int, float]":
-        return self.lhs() ** self.rhs()
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[int, float]":
+        return self.lhs(rng) ** self.rhs(rng)
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return _batch(operator.pow, self, n, rng)
+
+    def _range(self) -> "Tuple[float, float]":
+        lmin, lmax = self.lhs.min(), self.lhs.max()
+        rmin, rmax = self.rhs.min(), self.rhs.max()
+        bases = [lmin, lmax]
+        if lmin < 0 < lmax:
+            bases.append(0)
+        exps = {rmin, rmax}
+        if lmin < 0 and rmin < rmax and math.isfinite(rmin) and math.isfinite(rmax):
+            # A negative base alternates in sign with the exponent, so the
+            # extremes may be at the smallest or largest odd or even exponent
+            lo, hi = math.ceil(rmin), math.floor(rmax)
+            exps.update(e for e in (lo, lo + 1, hi - 1, hi) if lo <= e <= hi)
+        values = list()
+        for base in bases:
+            for exp in exps:
+                if base == 0 and exp < 0:
+                    values.extend((-math.inf, math.inf))
+                else:
+                    values.append(base**exp)
+        return _bounds(values)
+
+    def min(self) -> "Union[float, int]":
+        return self._range()[0]
+
+    def max(self) -> "Union[float, int]":
+        return self._range()[1]
+
+    def mean(self) -> "float":
+        lhs, rhs = constant(self.lhs), constant(self.rhs)
+        if lhs is None or rhs is None:
+            return self.distribution().mean()
+        return lhs**rhs
+
+    def variance(self) -> "float":
+        if constant(self.lhs) is None or constant(self.rhs) is None:
+            return self.distribution().variance()
+        return 0
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.pow, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Power:
+            return NotImplemented
+        return self.lhs == rhs.lhs and self.rhs == rhs.rhs
+
+    def __hash__(self) -> "int":
+        return hash((Power, self.lhs, self.rhs))
 
     def __repr__(self) -> "str":
         return "Power({}, {})".format(repr(self.lhs), repr(self.rhs))
 
     def __str__(self) -> "str":
         return "{}**{}".format(
-            nodestr(self.lhs, PrecedencePower), nodestr(self.rhs, PrecedencePower)
+            nodestr(self.lhs, PrecedencePower + 1), nodestr(self.rhs, PrecedencePower)
         )
 
 
 class Modulo(object):
-    __slots__ = ("lhs", "rhs")
+    __slots__ = ("lhs", "rhs", "__weakref__")
 
     def __init__(self, lhs, rhs) -> None:
         self.lhs = lhs
@@ -217,8 +607,60 @@ class Modulo(object):
     def precedence(self) -> "int":
         return PrecedenceMulDiv
 
-    def __call__(self) -> "Union[int, float]":
-        return self.lhs() % self.rhs()
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Union[int, float]":
+        return self.lhs(rng) % self.rhs(rng)
+
+    def evaluate_batch(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Union[float, int]]":
+        return _batch(operator.mod, self, n, rng)
+
+    def _range(self) -> "Tuple[float, float]":
+        lmin, lmax = self.lhs.min(), self.lhs.max()
+        rhs = constant(self.rhs)
+        if rhs is None:
+            return min(0, self.rhs.min()), max(0, self.rhs.max())
+        if lmin // rhs == lmax // rhs:
+            # The left hand side never wraps around
+            return lmin % rhs, lmax % rhs
+        step = 1 if type(lmin) is int and type(lmax) is int else 0
+        if rhs > 0:
+            return 0, rhs - step
+        return rhs + step, 0
+
+    def min(self) -> "Union[float, int]":
+        return self._range()[0]
+
+    def max(self) -> "Union[float, int]":
+        return self._range()[1]
+
+    def mean(self) -> "float":
+        lhs, rhs = constant(self.lhs), constant(self.rhs)
+        if lhs is None or rhs is None:
+            return self.distribution().mean()
+        return lhs % rhs
+
+    def variance(self) -> "float":
+        if constant(self.lhs) is None or constant(self.rhs) is None:
+            return self.distribution().variance()
+        return 0
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        return _distribution(operator.mod, self)
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Modulo:
+            return NotImplemented
+        return self.lhs == rhs.lhs and self.rhs == rhs.rhs
+
+    def __hash__(self) -> "int":
+        return hash((Modulo, self.lhs, self.rhs))
 
     def __repr__(self) -> "str":
         return "Modulo({}, {})".format(repr(self.lhs), repr(self.rhs))
+
+    def __str__(self) -> "str":
+        return "{} % {}".format(
+            nodestr(self.lhs, PrecedenceMulDiv),
+            nodestr(self.rhs, PrecedenceMulDiv + 1),
+        )
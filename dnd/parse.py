@@ -1,10 +1,16 @@
+import collections
+import re
+
+import dnd.bytecode
+import dnd.intern
 import dnd.roll
+import dnd.simplify
 import dnd.token as _token
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import List, Tuple, Union
+    from typing import Iterator, List, Tuple, Union
 
     Token = Tuple[int, Union[None, int, float, dnd.roll.Dice]]
 
@@ -15,30 +21,208 @@ def isvalue(tokid: "int") -> bool:
 
 def _handle_op(op: "int", output: "List"):
     data = _token.Data[op]
+    if len(output) < data[2]:
+        raise ValueError("missing operand for '{}'".format(_token.Values[op]))
     args = list()
     for _ in range(data[2]):
         args.append(output.pop())
     output.append(data[3](*reversed(args)))
 
 
-def expression(expr: "str"):
+# Every token is matched in one findall pass; the final group matches any
+# other character so that errors are reported rather than skipped
+_token_re = re.compile(
+    r"""\s*(?:
+        (\*\*|//|[-+*/%()])
+        |(\d+(?![\d.eEd]))
+        |(\d+)d(\d+)(?:([LH])(\d+))?(?:([LH])(\d+))?
+        |(\d+(?:\.\d+(?:[eE][-+]?\d+)?|[eE][-+]?\d+))
+        |(\d+)
+        |(\S)
+    )""",
+    re.VERBOSE,
+)
+
+_operators = {
+    "+": _token.Add,
+    "-": _token.Subtract,
+    "*": _token.Multiply,
+    "**": _token.Power,
+    "/": _token.Divide,
+    "//": _token.FloorDiv,
+    "%": _token.Modulo,
+    "(": _token.OpenParen,
+    ")": _token.CloseParen,
+}
+
+
+def lex(expr: "str") -> "List[Token]":
+    """Split an expression into tokens in a single pass
+
+    This produces the same tokens as tokenize, using one compiled regular
+    expression rather than scanning a character at a time.
+
+    :param expr: The expression to split into tokens
+    :returns: The tokens of the expression
+    """
+    tokens = list()
+    for op, i, count, sides, d1, n1, d2, n2, f, j, other in _token_re.findall(expr):
+        if op:
+            tokens.append((_operators[op], None))
+        elif i:
+            tokens.append((_token.Int, int(i)))
+        elif count:
+            drops = {"L": 0, "H": 0}
+            if d1:
+                drops[d1] = int(n1)
+            if d2:
+                if d2 == d1:
+                    raise ValueError("unexpected character '{}'".format(d2))
+                drops[d2] = int(n2)
+            dice = dnd.roll.Dice(int(count), int(sides), drops["L"], drops["H"])
+            tokens.append((_token.Dice, dice))
+        elif f:
+            tokens.append((_token.Float, float(f)))
+        elif j:
+            # An integer followed by a character which could not continue it
+            tokens.append((_token.Int, int(j)))
+        else:
+            raise ValueError("unexpected character '{}'".format(other))
+    return tokens
+
+
+class ExpressionCache(object):
+    """ExpressionCache is a size-bounded LRU cache of parsed expressions
+
+    Parsed trees are shared by every caller which parses the same text, and
+    their subtrees are interned with dnd.intern so that identical subtrees of
+    different expressions are shared as well. They must not be modified.
+    Text which fails to parse is cached as well, so that template statements
+    which name tables are only tokenized once.
+    """
+
+    def __init__(self, maxsize: "int" = 1024) -> None:
+        """Create an empty cache
+
+        :param maxsize: The maximum number of expressions to keep
+        """
+        self._maxsize = max(maxsize, 0)
+        self._entries = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self) -> "int":
+        return self._maxsize
+
+    @property
+    def hits(self) -> "int":
+        return self._hits
+
+    @property
+    def misses(self) -> "int":
+        return self._misses
+
+    @property
+    def evictions(self) -> "int":
+        return self._evictions
+
+    def get(self, expr: "str"):
+        """Get the parsed tree of an expression, parsing it if necessary
+
+        :param expr: The expression to parse
+        :returns: The shared tree of the parsed expression
+        :raises ValueError: If the expression could not be parsed
+        """
+        entry = self._entries.get(expr, None)
+        if entry is not None:
+            self._hits += 1
+            self._entries.move_to_end(expr)
+        else:
+            self._misses += 1
+            try:
+                node = dnd.simplify.simplify(_parse(expr))
+                entry = (dnd.intern.intern(node), None)
+            except ValueError as e:
+                entry = (None, str(e))
+            if self._maxsize > 0:
+                self._entries[expr] = entry
+                if len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+
+        if entry[1] is not None:
+            raise ValueError(entry[1])
+        return entry[0]
+
+    def clear(self) -> None:
+        """Remove every expression from the cache and reset the counters"""
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> "int":
+        return len(self._entries)
+
+    def __contains__(self, expr: "str") -> "bool":
+        return expr in self._entries
+
+    def __repr__(self) -> "str":
+        return "ExpressionCache(maxsize={}, hits={}, misses={}, evictions={})".format(
+            self._maxsize, self._hits, self._misses, self._evictions
+        )
+
+
+cache = ExpressionCache()
+
+
+def expression(expr: "str", cached: "bool" = True, simplify: "bool" = True):
+    """Parse an expression into a tree of nodes
+
+    By default the tree is simplified with dnd.simplify.simplify and taken
+    from the module cache, so it is shared with every other caller which
+    parsed the same text. Pass cached=False to parse a fresh tree which may
+    be freely modified; unsimplified trees are never cached.
+
+    :param expr: The expression to parse
+    :param cached: If the shared cache should be used
+    :param simplify: If the parsed tree should be simplified
+    :returns: The root node of the parsed expression
+    """
+    if not simplify:
+        return _parse(expr)
+    if cached:
+        return cache.get(expr)
+    return dnd.simplify.simplify(_parse(expr))
+
+
+def bytecode(expr: "str") -> "dnd.bytecode.Program":
+    """Parse an expression into flat postfix bytecode
+
+    The tokens are assembled as the shunting-yard produces them, without
+    building or simplifying a tree. To assemble a simplified expression,
+    use dnd.bytecode.flatten(expression(expr)).
+
+    :param expr: The expression to parse
+    :returns: The program which evaluates the expression
+    """
+    return dnd.bytecode.assemble(_postfix(expr))
+
+
+def _postfix(expr: "str") -> "Iterator[Token]":
+    """Generate the tokens of an expression in postfix order"""
     # Shunting-yard algorithm
-    output = list()
     operators = list()
 
-    idx, strlen = 0, len(expr)
     last = None
     # While there are tokens to be read
-    while idx < strlen:
-        # Read a token
-        idx, tok = token(idx, expr)
-
+    for tok in lex(expr):
         # If the token is a value
         if isvalue(tok[0]):
             # Put it into the output queue
-            # N.B. the 3rd item in the data struct is the class of the node
-            output.append(_token.Data[tok[0]][3](tok[1]))
-            # output.append((tok[0], None))
+            yield tok
         # If the token is a left parenthesis
         elif tok[0] == _token.OpenParen:
             # Push it into the operator stack
@@ -51,9 +235,7 @@ def expression(expr: "str"):
             # while the operator at the top of the stack is not a left parenthesis
             while operators[-1] != _token.OpenParen:
                 # Pop the operator from the operator stack into the output queue
-                _handle_op(operators.pop(), output)
-
-                # output.append((operators.pop(), None))
+                yield operators.pop(), None
                 # Assert there are other operators
                 if len(operators) == 0:
                     raise ValueError("mismatched parenthesis")
@@ -64,21 +246,17 @@ def expression(expr: "str"):
         else:
             # Check if our token is '-'; if it is, we need to distinguish it
             if tok[0] == _token.Subtract:
-                # If we're the first token
-                if last is None:
-                    # The minus is always an unary minus
-                    operators.append(_token.UnaryMinus)
-                # If the previous token was a operand (value) or a right parenthesis
-                elif isvalue(last) or last == _token.CloseParen:
-                    # The minus is always a binary minus
-                    operators.append(_token.Subtract)
-                # Otherwise, the last token was an operator or left parenthesis
-                else:
-                    # So this must be an unary minus
+                # If we're the first token, or the previous token was an
+                # operator or left parenthesis, this must be an unary minus
+                if last is None or not (isvalue(last) or last == _token.CloseParen):
+                    # Prefix operators never pop the operator stack
                     operators.append(_token.UnaryMinus)
-                # Short-circuit; make sure last is updated
-                last = tok[0]
-                continue
+                    # Short-circuit; make sure last is updated
+                    last = tok[0]
+                    continue
+                # Otherwise the previous token was an operand (value) or a
+                # right parenthesis, so this is a binary minus and is handled
+                # like any other binary operator
 
             # If the token is an operator o1
             data = _token.Data[tok[0]]
@@ -98,8 +276,7 @@ def expression(expr: "str"):
                 if not (d2[0] > data[0] or (d2[0] == data[0] and data[1])):
                     break
                 # Pop o2 from the operator stack into the output queue
-                _handle_op(operators.pop(), output)
-                # output.append((operators.pop(), None))
+                yield operators.pop(), None
             # Push o1 onto the operator stack
             operators.append(tok[0])
 
@@ -111,9 +288,20 @@ def expression(expr: "str"):
         if operators[-1] == _token.OpenParen:
             raise ValueError("mismatched parenthesis")
         # Pop the operator from the operator stack onto the output queue.
-        # output.append((operators.pop(), None))
-        _handle_op(operators.pop(), output)
+        yield operators.pop(), None
+
+
+def _parse(expr: "str"):
+    output = list()
+    for tok in _postfix(expr):
+        if isvalue(tok[0]):
+            # N.B. the 3rd item in the data struct is the class of the node
+            output.append(_token.Data[tok[0]][3](tok[1]))
+        else:
+            _handle_op(tok[0], output)
 
+    if len(output) == 0:
+        raise ValueError("empty expression")
     if len(output) > 1:
         raise ValueError("parsing error: more than one node at root")
     return output[0]
@@ -266,18 +454,18 @@ def _finishDice(count: "int", idx: "int", value: "str") -> "Tuple[int, Token]":
         return (idx, (_token.Dice, dnd.roll.Dice(count, sides)))
 
     if value[idx] == "H":
-        idx, drophigh = scanint(idx, value)
+        idx, drophigh = scanint(idx + 1, value)
 
         if idx < strlen and value[idx] == "L":
-            idx, droplow = scanint(idx, value)
+            idx, droplow = scanint(idx + 1, value)
             return (idx, (_token.Dice, dnd.roll.Dice(count, sides, droplow, drophigh)))
 
         return (idx, (_token.Dice, dnd.roll.Dice(count, sides, 0, drophigh)))
     elif value[idx] == "L":
-        idx, droplow = scanint(idx, value)
+        idx, droplow = scanint(idx + 1, value)
 
         if idx < strlen and value[idx] == "H":
-            idx, drophigh = scanint(idx, value)
+            idx, drophigh = scanint(idx + 1, value)
             return (idx, (_token.Dice, dnd.roll.Dice(count, sides, droplow, drophigh)))
 
         return (idx, (_token.Dice, dnd.roll.Dice(count, sides, droplow)))
@@ -0,0 +1,183 @@
+import random
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
+
+
+# Ranges at least this wide cannot be drawn exactly by scaling a float
+_ExactFloats = 1 << 53
+
+
+class Source(object):
+    """Source is the interface for a source of random numbers
+
+    Subclasses must implement random and randint; the remaining methods have
+    default implementations in terms of those two.
+    """
+
+    def random(self) -> "float":
+        """Get a random float in the range [0.0, 1.0)"""
+        raise NotImplementedError()
+
+    def randint(self, a: "int", b: "int") -> "int":
+        """Get a random integer in the range [a, b]"""
+        raise NotImplementedError()
+
+    def uniform(self, a: "float", b: "float") -> "float":
+        """Get a random float in the range [a, b)"""
+        return a + (b - a) * self.random()
+
+    def randoms(self, n: "int") -> "List[float]":
+        """Get a list of n random floats in the range [0.0, 1.0)"""
+        return [self.random() for _ in range(n)]
+
+    def randints(self, a: "int", b: "int", n: "int") -> "List[int]":
+        """Get a list of n random integers in the range [a, b]"""
+        return [self.randint(a, b) for _ in range(n)]
+
+
+class RandomSource(Source):
+    """RandomSource draws random numbers from a random.Random instance"""
+
+    def __init__(self, rng: "Optional[random.Random]" = None) -> None:
+        """Create a source using the given generator
+
+        :param rng: The generator to use, or None to use the random module
+        """
+        self._rng = random if rng is None else rng
+
+    @staticmethod
+    def seeded(seed: "Any") -> "RandomSource":
+        """Create a source with its own generator seeded with the given value"""
+        return RandomSource(random.Random(seed))
+
+    def random(self) -> "float":
+        return self._rng.random()
+
+    def randint(self, a: "int", b: "int") -> "int":
+        return self._rng.randint(a, b)
+
+    def uniform(self, a: "float", b: "float") -> "float":
+        return self._rng.uniform(a, b)
+
+    def randoms(self, n: "int") -> "List[float]":
+        rand = self._rng.random
+        return [rand() for _ in range(n)]
+
+    def randints(self, a: "int", b: "int", n: "int") -> "List[int]":
+        if b - a >= _ExactFloats:
+            # choices scales a random float, which cannot reach every value
+            randint = self._rng.randint
+            return [randint(a, b) for _ in range(n)]
+        return self._rng.choices(range(a, b + 1), k=n)
+
+
+class NumpySource(Source):
+    """NumpySource draws random numbers from a numpy.random.Generator
+
+    The generator is only used through its ``random`` and ``integers``
+    methods, so numpy is not imported by this module.
+    """
+
+    def __init__(self, generator: "Any") -> None:
+        self._gen = generator
+
+    def random(self) -> "float":
+        return float(self._gen.random())
+
+    def randint(self, a: "int", b: "int") -> "int":
+        return int(self._gen.integers(a, b + 1))
+
+    def randoms(self, n: "int") -> "List[float]":
+        return self._gen.random(n).tolist()
+
+    def randints(self, a: "int", b: "int", n: "int") -> "List[int]":
+        return self._gen.integers(a, b + 1, size=n).tolist()
+
+
+# The most integer ranges a BufferedSource keeps blocks for, and the size of
+# the first block drawn for a range
+MaxRanges = 32
+_FirstBlock = 16
+
+
+class BufferedSource(Source):
+    """BufferedSource hands out random numbers from pre-generated blocks
+
+    Blocks of floats, and of integers for each distinct range requested, are
+    drawn from the underlying source in bulk and then handed out one at a
+    time. Dice use only a handful of distinct ranges, so most draws are a
+    single list pop.
+
+    The block for a range starts small and doubles each time it is refilled,
+    so ranges which are only used a few times, such as the total weight of a
+    table whose weights keep changing, waste little. Only MaxRanges ranges
+    are kept; the range refilled longest ago is dropped to make room.
+    """
+
+    def __init__(self, source: "Optional[Source]" = None, size: "int" = 4096) -> None:
+        """Create a buffered source
+
+        :param source: The source to draw blocks from, or None for the default
+        :param size: The most values drawn per block
+        """
+        self._source = default if source is None else source
+        self._size = max(size, 1)
+        self._floats = list()  # type: List[float]
+        self._ints = dict()  # type: Dict[Tuple[int, int], List[int]]
+        self._blocks = dict()  # type: Dict[Tuple[int, int], int]
+
+    def _refill(self, a: "int", b: "int", n: "int") -> "List[int]":
+        """Refill the block of a range so that it holds at least n values"""
+        key = (a, b)
+        # Reinsert the range, so the dicts stay ordered by the last refill
+        buf = self._ints.pop(key, None)
+        block = self._blocks.pop(key, 0)
+        if buf is None:
+            buf = list()
+            while len(self._ints) >= MaxRanges:
+                oldest = next(iter(self._ints))
+                del self._ints[oldest]
+                del self._blocks[oldest]
+        block = min(max(block * 2, _FirstBlock), self._size)
+        buf.extend(self._source.randints(a, b, max(block, n - len(buf))))
+        self._ints[key] = buf
+        self._blocks[key] = block
+        return buf
+
+    def random(self) -> "float":
+        try:
+            return self._floats.pop()
+        except IndexError:
+            self._floats = self._source.randoms(self._size)
+            return self._floats.pop()
+
+    def randint(self, a: "int", b: "int") -> "int":
+        try:
+            return self._ints[(a, b)].pop()
+        except (KeyError, IndexError):
+            return self._refill(a, b, 1).pop()
+
+    def randoms(self, n: "int") -> "List[float]":
+        if n >= self._size:
+            return self._source.randoms(n)
+        if n > len(self._floats):
+            self._floats.extend(self._source.randoms(self._size))
+        result = self._floats[-n:] if n > 0 else []
+        del self._floats[len(self._floats) - n :]
+        return result
+
+    def randints(self, a: "int", b: "int", n: "int") -> "List[int]":
+        if n >= self._size:
+            return self._source.randints(a, b, n)
+        buf = self._ints.get((a, b))
+        if buf is None or n > len(buf):
+            buf = self._refill(a, b, n)
+        result = buf[-n:] if n > 0 else []
+        del buf[len(buf) - n :]
+        return result
+
+
+default = RandomSource()  # type: Source
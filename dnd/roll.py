@@ -1,65 +1,306 @@
-import random
+import array
+import itertools
+import math
 
+import dnd.dist
 import dnd.listview
+import dnd.rng
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import List
+    from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+def _packed(
+    typecode: "str", values: "Iterable[int]", largest: "int"
+) -> "Sequence[int]":
+    """Store non-negative ints in an array, or a list if largest does not fit
+
+    :param typecode: The typecode of the array
+    :param values: The values to store
+    :param largest: The largest value which may be stored
+    :returns: The stored values
+    """
+    if largest < 1 << (array.array(typecode).itemsize * 8 - 1):
+        return array.array(typecode, values)
+    return list(values)
 
 
 class Roll(object):
-    """Roll represents the results of rolling a Dice object"""
+    """Roll represents the results of rolling a Dice object
+
+    The die values are stored in a compact array, or a list if they are too
+    large for one, and the views of the kept and dropped dice are only created
+    when they are accessed.
+    """
 
-    def __init__(self, values: "List[int]", droplow: "int", drophigh: "int") -> None:
+    __slots__ = ("_values", "_droplow", "_drophigh", "_result")
+
+    def __init__(
+        self, values: "Sequence[int]", droplow: "int", drophigh: "int"
+    ) -> None:
         """Initialize the roll object with the given data
 
         Invariants:
-            values must be a non-empty list of values.
+            values must be a sorted sequence of values.
             droplow must be a non-negative integer >= 0
             drophigh must be a non-negative integer >= 0
-            len(values) must be >= droplow + drophigh
 
-        :param values: The list of die values
+        If len(values) is less than droplow + drophigh, all values are
+        dropped, with the low dice dropped first.
+
+        :param values: The sorted die values
         :param droplow: The number of low dice to drop
         :param drophigh: The number of high dice to drop
         """
+        if type(values) is not array.array:
+            values = _packed("i", values, max(values, default=0))
         self._values = values
         self._droplow = droplow
         self._drophigh = drophigh
+        self._result = None  # type: Optional[int]
 
-        endidx = len(values) - drophigh
-        self._vHigh = dnd.listview.ListView(values, endidx, len(values))
-        self._vLow = dnd.listview.ListView(values, 0, droplow)
-        self._vGood = dnd.listview.ListView(values, droplow, endidx)
-        self._result = sum(self._vGood)
+    def _bounds(self) -> "Tuple[int, int]":
+        length = len(self._values)
+        start = min(self._droplow, length)
+        return start, max(length - self._drophigh, start)
 
     @property
     def result(self) -> "int":
+        if self._result is None:
+            start, end = self._bounds()
+            values = self._values
+            if type(values) is array.array:
+                values = memoryview(values)
+            self._result = sum(values[start:end])
         return self._result
 
     @property
     def values(self) -> "dnd.listview.ListView":
-        return self._vGood
+        start, end = self._bounds()
+        return dnd.listview.ListView(self._values, start, end)
 
     @property
     def dropped_low(self) -> "dnd.listview.ListView":
-        return self._vLow
+        return dnd.listview.ListView(self._values, 0, self._bounds()[0])
 
     @property
     def dropped_high(self) -> "dnd.listview.ListView":
-        return self._vHigh
+        end = self._bounds()[1]
+        return dnd.listview.ListView(self._values, end, len(self._values))
+
+    def __repr__(self) -> "str":
+        return "Roll({}, {}, {})".format(
+            list(self._values), self._droplow, self._drophigh
+        )
+
+    def __str__(self) -> "str":
+        return "{} = [{}, {}, {}]".format(
+            self.result, self.dropped_low, self.values, self.dropped_high
+        )
+
+
+class HistogramRoll(object):
+    """HistogramRoll represents the results of rolling a Dice object by counts
+
+    Rather than storing each die, the roll stores how many dice landed on
+    each face. It exposes the same interface as Roll, with the views of the
+    dice created on demand from the counts.
+    """
+
+    __slots__ = ("_counts", "_droplow", "_drophigh", "_start", "_end", "_result")
+
+    def __init__(self, counts: "List[int]", droplow: "int", drophigh: "int") -> None:
+        """Initialize the roll object with the given data
+
+        :param counts: The number of dice which rolled each face, starting at 1
+        :param droplow: The number of low dice to drop
+        :param drophigh: The number of high dice to drop
+        """
+        self._counts = counts
+        self._droplow = droplow
+        self._drophigh = drophigh
+
+        # Walk the histogram, summing the faces which fall in the kept range
+        length = sum(counts)
+        start = min(droplow, length)
+        end = max(length - drophigh, start)
+        pos, result = 0, 0
+        for value, count in enumerate(counts, 1):
+            kept = min(pos + count, end) - max(pos, start)
+            if kept > 0:
+                result += kept * value
+            pos += count
+        self._start = start
+        self._end = end
+        self._result = result
+
+    @property
+    def counts(self) -> "List[int]":
+        return self._counts
+
+    @property
+    def result(self) -> "int":
+        return self._result
+
+    @property
+    def values(self) -> "dnd.listview.HistogramView":
+        return dnd.listview.HistogramView(self._counts, self._start, self._end)
+
+    @property
+    def dropped_low(self) -> "dnd.listview.HistogramView":
+        return dnd.listview.HistogramView(self._counts, 0, self._start)
+
+    @property
+    def dropped_high(self) -> "dnd.listview.HistogramView":
+        return dnd.listview.HistogramView(self._counts, self._end, sum(self._counts))
 
     def __repr__(self) -> "str":
-        return "Roll({}, {}, {})".format(self._values, self._droplow, self._drophigh)
+        return "HistogramRoll({}, {}, {})".format(
+            self._counts, self._droplow, self._drophigh
+        )
 
     def __str__(self) -> "str":
         return "{} = [{}, {}, {}]".format(
-            self._result, self._vLow, self._vGood, self._vHigh
+            self._result, self.dropped_low, self.values, self.dropped_high
+        )
+
+
+def _binomial(n: "int", p: "float", rng: "dnd.rng.Source") -> "int":
+    """Draw from the binomial distribution B(n, p)
+
+    This follows random.binomialvariate from Python 3.12; the geometric
+    method is used when n * p is small and BTRS (transformed rejection with
+    squeeze) otherwise, so the cost does not grow with n.
+    """
+    if p <= 0.0:
+        return 0
+    if p >= 1.0:
+        return n
+    if p > 0.5:
+        return n - _binomial(n, 1.0 - p, rng)
+
+    rand = rng.random
+    if n * p < 10.0:
+        x = y = 0
+        c = math.log2(1.0 - p)
+        while True:
+            y += math.floor(math.log2(1.0 - rand()) / c) + 1
+            if y > n:
+                return x
+            x += 1
+
+    spq = math.sqrt(n * p * (1.0 - p))
+    b = 1.15 + 2.53 * spq
+    a = -0.0873 + 0.0248 * b + 0.01 * p
+    c = n * p + 0.5
+    vr = 0.92 - 4.2 / b
+    alpha = (2.83 + 5.1 / b) * spq
+    lpq = math.log(p / (1.0 - p))
+    m = math.floor((n + 1) * p)
+    h = math.lgamma(m + 1) + math.lgamma(n - m + 1)
+    while True:
+        u = rand() - 0.5
+        us = 0.5 - abs(u)
+        k = math.floor((2.0 * a / us + b) * u + c)
+        if k < 0 or k > n:
+            continue
+        v = rand()
+        if us >= 0.07 and v <= vr:
+            return k
+        v *= alpha / (a / (us * us) + b)
+        lhs = math.log(v)
+        if lhs <= h - math.lgamma(k + 1) - math.lgamma(n - k + 1) + (k - m) * lpq:
+            return k
+
+
+class Rolls(object):
+    """Rolls holds the packed results of rolling a Dice object many times
+
+    The totals are stored in a single array. The individual die values are
+    only kept when requested, as one flat array of ``len(self) * count``
+    values where the dice of each roll are sorted in ascending order. Values
+    which are too large for an array are stored in a list instead.
+    """
+
+    __slots__ = ("_totals", "_count", "_droplow", "_drophigh", "_dice")
+
+    def __init__(
+        self,
+        totals: "Sequence[int]",
+        count: "int",
+        droplow: "int",
+        drophigh: "int",
+        dice: "Optional[Sequence[int]]" = None,
+    ) -> None:
+        """Initialize the rolls object with the given data
+
+        :param totals: The result of each roll
+        :param count: The number of dice in each roll
+        :param droplow: The number of low dice dropped from each roll
+        :param drophigh: The number of high dice dropped from each roll
+        :param dice: The sorted die values of every roll, or None
+        """
+        self._totals = totals
+        self._count = count
+        self._droplow = droplow
+        self._drophigh = drophigh
+        self._dice = dice
+
+    @property
+    def totals(self) -> "Sequence[int]":
+        return self._totals
+
+    @property
+    def dice(self) -> "Optional[Sequence[int]]":
+        return self._dice
+
+    @property
+    def count(self) -> "int":
+        return self._count
+
+    def roll(self, idx: "int") -> "Roll":
+        """Get the roll at the given index as a Roll object
+
+        This is only possible if the individual die values were kept.
+
+        :param idx: The index of the roll
+        :returns: A Roll containing the dice of the given roll
+        """
+        if self._dice is None:
+            raise ValueError("die values were not kept")
+        if idx < 0:
+            idx += len(self._totals)
+        if idx < 0 or idx >= len(self._totals):
+            raise IndexError("roll index out of range")
+        start = idx * self._count
+        return Roll(
+            self._dice[start : start + self._count], self._droplow, self._drophigh
+        )
+
+    def __len__(self) -> "int":
+        return len(self._totals)
+
+    def __getitem__(self, idx: "int") -> "int":
+        return self._totals[idx]
+
+    def __iter__(self) -> "Iterator[int]":
+        return iter(self._totals)
+
+    def __repr__(self) -> "str":
+        return "Rolls({}, {}, {}, {}, {})".format(
+            list(self._totals),
+            self._count,
+            self._droplow,
+            self._drophigh,
+            None if self._dice is None else list(self._dice),
         )
 
 
 class Dice(object):
+    __slots__ = ("_count", "_sides", "_droplow", "_drophigh", "__weakref__")
+
     def __init__(
         self, count: "int", sides: "int", droplow: "int" = 0, drophigh: "int" = 0
     ) -> None:
@@ -94,17 +335,122 @@ class Dice(object):
     def drophigh(self) -> "int":
         return self._drophigh
 
-    def roll(self) -> "Roll":
+    @property
+    def kept(self) -> "int":
+        """The number of dice which count towards the result"""
+        return max(self._count - self._droplow - self._drophigh, 0)
+
+    def min(self) -> "int":
+        return self.kept
+
+    def max(self) -> "int":
+        return self.kept * self._sides
+
+    def mean(self) -> "float":
+        if self._droplow == 0 and self._drophigh == 0:
+            return self._count * (self._sides + 1) / 2
+        return self.distribution().mean()
+
+    def variance(self) -> "float":
+        if self._droplow == 0 and self._drophigh == 0:
+            return self._count * (self._sides * self._sides - 1) / 12
+        return self.distribution().variance()
+
+    def roll(self, rng: "Optional[dnd.rng.Source]" = None) -> "Roll":
         """Simulate rolling this set of dice and return a Roll object
 
+        :param rng: The source of random numbers, or None for the default
         :returns: A Roll containing the results of the roll
         """
-        r = [random.randint(1, self._sides) for _ in range(self._count)]
+        if rng is None:
+            rng = dnd.rng.default
+        r = rng.randints(1, self._sides, self._count)
         r.sort()
-        return Roll(r, self._droplow, self._drophigh)
+        return Roll(_packed("i", r, self._sides), self._droplow, self._drophigh)
+
+    def roll_histogram(self, rng: "Optional[dnd.rng.Source]" = None) -> "HistogramRoll":
+        """Simulate rolling this set of dice by counting the dice on each face
+
+        The face counts are drawn from a single multinomial distribution, so
+        the time and memory used depend on the number of sides rather than the
+        number of dice. This is much faster for very large pools of dice.
+
+        :param rng: The source of random numbers, or None for the default
+        :returns: A HistogramRoll containing the results of the roll
+        """
+        if rng is None:
+            rng = dnd.rng.default
+        counts = [0] * self._sides
+        remaining = self._count
+        for face in range(self._sides - 1):
+            if remaining == 0:
+                break
+            counts[face] = _binomial(remaining, 1.0 / (self._sides - face), rng)
+            remaining -= counts[face]
+        counts[-1] += remaining
+        return HistogramRoll(counts, self._droplow, self._drophigh)
+
+    def distribution(self) -> "dnd.dist.Distribution":
+        """Calculate the exact distribution of the result of rolling these dice
+
+        The distribution is memoized, so repeated calls for dice with the same
+        count, sides and drops are a cache lookup.
+
+        :returns: The distribution of Roll.result
+        """
+        return dnd.dist.dice(self._count, self._sides, self._droplow, self._drophigh)
+
+    def roll_many(
+        self, n: "int", keep: "bool" = False, rng: "Optional[dnd.rng.Source]" = None
+    ) -> "Rolls":
+        """Simulate rolling this set of dice n times
+
+        All n * count dice are drawn in one call and the results are packed
+        into arrays rather than creating a Roll object per roll.
+
+        :param n: The number of times to roll the dice
+        :param keep: If the individual die values should be kept
+        :param rng: The source of random numbers, or None for the default
+        :returns: A Rolls containing the results of every roll
+        """
+        n = max(n, 0)
+        count = self._count
+        droplow, drophigh = self._droplow, self._drophigh
+        if count == 0:
+            dice = array.array("i") if keep else None
+            return Rolls(array.array("q", [0]) * n, 0, droplow, drophigh, dice)
+
+        if rng is None:
+            rng = dnd.rng.default
+        draws = rng.randints(1, self._sides, n * count)
+        largest = self._sides * count
+        if not keep and droplow == 0 and drophigh == 0:
+            totals = _packed("q", map(sum, zip(*[iter(draws)] * count)), largest)
+            return Rolls(totals, count, droplow, drophigh)
+
+        rows = [sorted(draws[i : i + count]) for i in range(0, n * count, count)]
+        # Clamp the kept range as Roll does, so every die may be dropped
+        start = min(droplow, count)
+        end = max(count - drophigh, start)
+        totals = _packed("q", [sum(r[start:end]) for r in rows], largest)
+        dice = None
+        if keep:
+            dice = _packed("i", itertools.chain.from_iterable(rows), self._sides)
+        return Rolls(totals, count, droplow, drophigh, dice)
+
+    def __call__(self, rng: "Optional[dnd.rng.Source]" = None) -> "Roll":
+        return self.roll(rng)
+
+    def _key(self) -> "Tuple[int, int, int, int]":
+        return self._count, self._sides, self._droplow, self._drophigh
+
+    def __eq__(self, rhs: "object") -> "bool":
+        if type(rhs) is not Dice:
+            return NotImplemented
+        return self._key() == rhs._key()
 
-    def __call__(self) -> "Roll":
-        return self.roll()
+    def __hash__(self) -> "int":
+        return hash(self._key())
 
     def __repr__(self) -> "str":
         return "Dice({}, {}, {}, {})".format(
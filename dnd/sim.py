@@ -0,0 +1,157 @@
+import collections
+import concurrent.futures
+import hashlib
+import random
+
+import dnd.rng
+import dnd.table
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Counter, Dict, List, Optional, Union  # noqa: F401
+
+DefaultShardSize = 10000
+
+# The target of the simulation in a worker process, set by _init_worker
+_target = None  # type: Any
+_tables = None  # type: Optional[Dict[str, dnd.table.Table]]
+
+
+class Summary(object):
+    """Summary holds the merged results of a simulation"""
+
+    def __init__(self, histogram: "Counter", seed: "int") -> None:
+        """Initialize the summary with the given data
+
+        :param histogram: How many times each result occured
+        :param seed: The seed the simulation was run with
+        """
+        self._histogram = histogram
+        self._seed = seed
+        self._samples = sum(histogram.values())
+
+    @property
+    def histogram(self) -> "Counter":
+        return self._histogram
+
+    @property
+    def seed(self) -> "int":
+        return self._seed
+
+    @property
+    def samples(self) -> "int":
+        return self._samples
+
+    def min(self) -> "Any":
+        return min(self._histogram)
+
+    def max(self) -> "Any":
+        return max(self._histogram)
+
+    def mean(self) -> "float":
+        """Get the mean of a numeric simulation"""
+        return sum(v * c for v, c in self._histogram.items()) / self._samples
+
+    def variance(self) -> "float":
+        """Get the population variance of a numeric simulation"""
+        mean = self.mean()
+        return (
+            sum((v - mean) ** 2 * c for v, c in self._histogram.items()) / self._samples
+        )
+
+    def probability(self, value: "Any") -> "float":
+        return self._histogram.get(value, 0) / self._samples
+
+    def __repr__(self) -> "str":
+        return "Summary({}, {})".format(repr(self._histogram), repr(self._seed))
+
+
+def derive_seed(seed: "int", index: "int") -> "int":
+    """Derive the seed of a shard from the seed of a simulation
+
+    Seeds are derived by hashing so that the stream of each shard depends
+    only on the simulation seed and the index of the shard.
+    """
+    digest = hashlib.sha256("{}:{}".format(seed, index).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def _init_worker(target: "Any", tables: "Optional[Dict[str, dnd.table.Table]]"):
+    global _target, _tables
+    _target = target
+    _tables = tables
+
+
+def _run_shard(samples: "int", seed: "int") -> "Counter":
+    rng = dnd.rng.RandomSource.seeded(seed)
+    if type(_target) is str:
+        evaluate = dnd.table.Table.evaluate
+        name, tables = _target, _tables
+        return collections.Counter(
+            evaluate(name, None, tables, rng) for _ in range(samples)
+        )
+    node = _target
+    batch = getattr(node, "evaluate_batch", None)
+    if batch is not None:
+        return collections.Counter(batch(samples, rng))
+    return collections.Counter(node(rng) for _ in range(samples))
+
+
+def simulate(
+    target: "Union[str, Any]",
+    samples: "int",
+    tables: "Optional[Dict[str, dnd.table.Table]]" = None,
+    seed: "Optional[int]" = None,
+    workers: "Optional[int]" = None,
+    shard_size: "int" = DefaultShardSize,
+) -> "Summary":
+    """Run a Monte Carlo simulation of an expression or table
+
+    The samples are split into shards of shard_size samples, each of which
+    is run with its own random stream derived from the seed. The results
+    therefore only depend on the seed, not on the number of workers.
+
+    :param target: A parsed expression, or the name of a table in tables
+    :param samples: The number of samples to take
+    :param tables: The tables to evaluate a table name against
+    :param seed: The seed of the simulation, or None to pick one at random
+    :param workers: The number of worker processes, or None for the default
+    :param shard_size: The number of samples in each shard
+    :returns: A Summary of the merged results
+    :raises ValueError: If samples is not positive, or target is not in tables
+    """
+    if samples <= 0:
+        raise ValueError("samples must be positive")
+    if type(target) is str:
+        if tables is None or target not in tables:
+            raise ValueError("table {} not found".format(repr(target)))
+    elif not callable(target):
+        raise TypeError("cannot simulate {}".format(type(target).__name__))
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+
+    shard_size = max(shard_size, 1)
+    shards = list()  # type: List[int]
+    remaining = samples
+    while remaining > 0:
+        shards.append(min(shard_size, remaining))
+        remaining -= shards[-1]
+    seeds = [derive_seed(seed, i) for i in range(len(shards))]
+
+    histogram = collections.Counter()
+    if workers == 1 or len(shards) <= 1:
+        _init_worker(target, tables)
+        try:
+            for n, s in zip(shards, seeds):
+                histogram.update(_run_shard(n, s))
+        finally:
+            _init_worker(None, None)
+        return Summary(histogram, seed)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(target, tables)
+    ) as pool:
+        for result in pool.map(_run_shard, shards, seeds):
+            histogram.update(result)
+    return Summary(histogram, seed)
@@ -0,0 +1,153 @@
+import dnd.nodes as _node
+import dnd.roll
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional, Tuple  # noqa: F401
+
+    Term = Tuple[int, object]
+
+# The largest integer power, in bits, which will be folded at parse time
+MaxFoldBits = 4096
+
+_sums = (_node.Add, _node.Subtract, _node.Negative)
+_binary = (
+    _node.Multiply,
+    _node.Divide,
+    _node.FloorDiv,
+    _node.Modulo,
+    _node.Power,
+)
+
+
+def simplify(node):
+    """Simplify an expression tree
+
+    Constant subtrees are folded into a single Value, double negation is
+    removed, dice without drops which are added together are merged into a
+    single pool and integer identity operations are stripped. Operations
+    which would fail, such as dividing by zero, are left in the tree so that
+    they fail when evaluated.
+
+    Terms of sums may be reordered, which changes the order in which dice
+    are drawn but not the distribution of the result.
+
+    :param node: The root of the tree to simplify
+    :returns: The root of the simplified tree
+    """
+    try:
+        return _simplify(node)
+    except RecursionError:
+        return node
+
+
+def _fold(node) -> "Optional[_node.Value]":
+    """Evaluate a node whose operands are all Values"""
+    t = type(node)
+    if t is _node.Power:
+        base, exp = node.lhs.value, node.rhs.value
+        if type(base) is int and type(exp) is int and abs(base) > 1:
+            if exp * abs(base).bit_length() > MaxFoldBits:
+                return None
+    try:
+        value = node()
+    except (ArithmeticError, ValueError):
+        return None
+    if type(value) is not int and type(value) is not float:
+        return None
+    return _node.Value(value)
+
+
+def _simplify(node):
+    t = type(node)
+    if t in _sums:
+        return _simplify_sum(node)
+    if t not in _binary:
+        return node
+
+    lhs, rhs = _simplify(node.lhs), _simplify(node.rhs)
+    result = t(lhs, rhs)
+    lconst = lhs.value if type(lhs) is _node.Value else None
+    rconst = rhs.value if type(rhs) is _node.Value else None
+    if lconst is not None and rconst is not None:
+        folded = _fold(result)
+        return result if folded is None else folded
+
+    # Strip identities; only integer identities keep the type of the result
+    if t is _node.Multiply:
+        if type(rconst) is int and rconst == 1:
+            return lhs
+        if type(lconst) is int and lconst == 1:
+            return rhs
+    elif t is _node.Power:
+        if type(rconst) is int and rconst == 1:
+            return lhs
+    return result
+
+
+def _terms(node) -> "List[Term]":
+    """Flatten a sum into a list of signed terms"""
+    terms = list()  # type: List[Term]
+    stack = [(1, node)]
+    while len(stack) > 0:
+        sign, n = stack.pop()
+        t = type(n)
+        if t is _node.Add:
+            stack.append((sign, n.rhs))
+            stack.append((sign, n.lhs))
+        elif t is _node.Subtract:
+            stack.append((-sign, n.rhs))
+            stack.append((sign, n.lhs))
+        elif t is _node.Negative:
+            stack.append((-sign, n.value))
+        else:
+            s = _simplify(n)
+            if type(s) in _sums:
+                stack.append((sign, s))
+            else:
+                terms.append((sign, s))
+    return terms
+
+
+def _simplify_sum(node):
+    terms = _terms(node)
+    if all(type(n) is _node.Value for _, n in terms):
+        # Evaluate in the original order so float sums round the same way
+        folded = _fold(node)
+        if folded is not None:
+            return folded
+
+    # Merge integer constants into one term and pools of the same dice
+    constants = [n.value for _, n in terms if type(n) is _node.Value]
+    merge_constants = all(type(v) is int for v in constants)
+    total = 0
+    pools = dict()  # type: Dict[Tuple[int, int], int]
+    merged = list()  # type: List[Term]
+    for sign, n in terms:
+        t = type(n)
+        if t is _node.Value and merge_constants:
+            total += sign * n.value
+            continue
+        if t is _node.Dice and n.dice.droplow == 0 and n.dice.drophigh == 0:
+            key = (sign, n.dice.sides)
+            idx = pools.get(key, None)
+            if idx is not None:
+                count = merged[idx][1].dice.count + n.dice.count
+                merged[idx] = (sign, _node.Dice(dnd.roll.Dice(count, key[1])))
+                continue
+            pools[key] = len(merged)
+        merged.append((sign, n))
+    if total > 0 or len(merged) == 0:
+        merged.append((1, _node.Value(total)))
+    elif total < 0:
+        merged.append((-1, _node.Value(-total)))
+
+    sign, result = merged[0]
+    if sign < 0:
+        result = _node.Negative(result)
+        if type(result.value) is _node.Value:
+            result = _node.Value(-result.value.value)
+    for sign, n in merged[1:]:
+        result = _node.Add(result, n) if sign > 0 else _node.Subtract(result, n)
+    return result
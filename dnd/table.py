@@ -1,15 +1,29 @@
+import bisect
+import heapq
+import itertools
 import json
+import math
 import os.path
-import random
 
 import dnd.err
 import dnd.jsonutil
+import dnd.rng
 import dnd.template
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Any, Dict, List, Optional, Tuple, Union
+    from typing import (  # noqa: F401
+        Any,
+        Container,
+        Dict,
+        Iterator,
+        List,
+        Optional,
+        Set,
+        Tuple,
+        Union,
+    )
     from dnd.jsonutil import Number
 
 
@@ -53,6 +67,12 @@ class Row(object):
     def weight(self) -> "dnd.jsonutil.Number":
         return self._weight
 
+    @weight.setter
+    def weight(self, weight: "Number") -> None:
+        # Tables cache the weights of their rows; use Table.set_weight to
+        # change the weight of a row in a table
+        self._weight = float(weight)
+
     @property
     def template(self) -> "dnd.template.Template":
         return self._template
@@ -64,22 +84,218 @@ class Row(object):
         return self._desc
 
 
+class Alias(object):
+    """Alias is a Walker/Vose alias table for drawing weighted indices
+
+    Each index owns one column, which is split between the index and its
+    alias so that every column has the same total weight; a draw picks a
+    column uniformly and then one of its two halves. When every weight is a
+    whole number the columns are held as integers and drawn with a single
+    randint, so the probability of each index is exact.
+    """
+
+    __slots__ = ("_cutoff", "_alias", "_scale")
+
+    def __init__(self, weights: "List[float]") -> None:
+        """Build the alias table of a list of weights
+
+        :param weights: The weight of each index; negative weights count as
+                        zero
+        :raises ValueError: If there are no weights
+        """
+        n = len(weights)
+        if n == 0:
+            raise ValueError("cannot draw from no weights")
+        weights = [max(w, 0) for w in weights]
+        if sum(weights) <= 0:
+            # Nothing has any weight, so always draw the first index
+            weights = [1] + [0] * (n - 1)
+
+        if all(float(w).is_integer() for w in weights):
+            # Column i holds w[i] * n of the total weight n * W
+            full = int(sum(weights))  # type: Number
+            scaled = [int(w) * n for w in weights]  # type: List[Number]
+            self._scale = full
+        else:
+            total = sum(weights)
+            full = 1.0
+            scaled = [w * n / total for w in weights]
+            self._scale = None
+
+        self._cutoff = [full] * n
+        self._alias = list(range(n))
+        small = [i for i, s in enumerate(scaled) if s < full]
+        large = [i for i, s in enumerate(scaled) if s >= full]
+        while len(small) > 0 and len(large) > 0:
+            lo, hi = small.pop(), large.pop()
+            self._cutoff[lo] = scaled[lo]
+            self._alias[lo] = hi
+            scaled[hi] -= full - scaled[lo]
+            (small if scaled[hi] < full else large).append(hi)
+        # Any column left over is full; with floats this absorbs rounding
+
+    def draw(self, rng: "dnd.rng.Source") -> "int":
+        """Draw a random index
+
+        :param rng: The source of random numbers
+        :returns: The drawn index
+        """
+        n = len(self._cutoff)
+        if self._scale is not None:
+            i, r = divmod(rng.randint(0, n * self._scale - 1), self._scale)
+        else:
+            u = rng.random() * n
+            i = min(int(u), n - 1)
+            r = u - i
+        return i if r < self._cutoff[i] else self._alias[i]
+
+    def __len__(self) -> "int":
+        return len(self._cutoff)
+
+
+class Fenwick(object):
+    """Fenwick is a binary indexed tree of weights for weighted draws
+
+    Unlike an Alias table, a weight may be changed in O(log n) time, and
+    draws take O(log n) time. Integer weights are drawn exactly, as with
+    Alias, and negative weights are treated as zero.
+    """
+
+    __slots__ = ("_weights", "_tree", "_total", "_exact", "_mask")
+
+    def __init__(self, weights: "List[float]") -> None:
+        """Build the tree of a list of weights in O(n) time
+
+        :param weights: The weight of each index
+        """
+        self._exact = True
+        self._weights = [self._weight(w) for w in weights]
+        n = len(self._weights)
+        self._tree = [0] + self._weights  # type: List[Number]
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self._tree[parent] += self._tree[i]
+        self._total = sum(self._weights)
+        self._mask = 1 << max(n.bit_length() - 1, 0) if n > 0 else 0
+
+    def _weight(self, weight: "Number") -> "Number":
+        if weight < 0:
+            return 0
+        if float(weight).is_integer():
+            return int(weight)
+        self._exact = False
+        return weight
+
+    @property
+    def total(self) -> "Number":
+        return self._total
+
+    def get(self, idx: "int") -> "Number":
+        return self._weights[idx]
+
+    def set(self, idx: "int", weight: "Number") -> None:
+        """Set the weight of an index in O(log n) time"""
+        weight = self._weight(weight)
+        delta = weight - self._weights[idx]
+        self._weights[idx] = weight
+        self._total += delta
+        i, n = idx + 1, len(self._weights)
+        while i <= n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, value: "Number") -> "int":
+        """Find the index whose range of the cumulative weights holds value"""
+        tree, n = self._tree, len(self._weights)
+        idx, step = 0, self._mask
+        while step > 0:
+            nxt = idx + step
+            if nxt <= n and tree[nxt] <= value:
+                idx = nxt
+                value -= tree[nxt]
+            step >>= 1
+        if idx >= n:
+            # Float rounding put value past the end; use the last weight
+            idx = max(i for i, w in enumerate(self._weights) if w > 0)
+        return idx
+
+    def draw(self, rng: "dnd.rng.Source") -> "int":
+        """Draw a random index; with no total weight this is always 0"""
+        if self._total <= 0:
+            return 0
+        if self._exact:
+            # Values are drawn from a power of two range and rejected past the
+            # total, so that the range only changes when the total changes
+            # bit length rather than on every update
+            total = self._total
+            bound = (1 << (total - 1).bit_length()) - 1
+            while True:
+                value = rng.randint(0, bound)
+                if value < total:
+                    return self.find(value)
+        return self.find(rng.random() * self._total)
+
+    def __len__(self) -> "int":
+        return len(self._weights)
+
+
 class Table(object):
     @staticmethod
     def load(
-        filename: "str", errh: "dnd.err.Handler" = dnd.err.DefaultHandler
+        filename: "str",
+        errh: "dnd.err.Handler" = dnd.err.DefaultHandler,
+        variables: "Optional[Container[str]]" = None,
     ) -> "Optional[Tuple[Optional[str], Dict[str, Table]]]":
         # TODO: Support other formats? E.g. a binary format
-        return Table.load_json(filename, errh)
+        return Table.load_json(filename, errh, variables)
 
     @staticmethod
     def load_json(
-        filename: "str", errh: "dnd.err.Handler" = dnd.err.DefaultHandler
+        filename: "str",
+        errh: "dnd.err.Handler" = dnd.err.DefaultHandler,
+        variables: "Optional[Container[str]]" = None,
     ) -> "Optional[Tuple[Optional[str], Dict[str, Table]]]":
+        """Load a file of tables and the files it references
+
+        Tables which refer back to themselves on every row are reported as
+        errors. If the names of the values the tables will be evaluated with
+        are given, the tables are also linked and inlined; otherwise every
+        statement is looked up when it is evaluated, and a value takes
+        precedence over a table of the same name.
+
+        :param filename: The file to load
+        :param errh: The handler to report errors to
+        :param variables: The names of the values the tables will be
+                          evaluated with, or None to leave the tables
+                          unlinked; when given, any other statement which
+                          does not name a table is reported as an error
+        :returns: The name of the default table and the loaded tables
+        """
         loaded = set()
         dname, fname = os.path.split(filename)
         loaded.add(fname)
-        return Table._loadjson(dname, fname, errh, loaded)
+        result = Table._loadjson(dname, fname, errh, loaded)
+        if result is None:
+            return None
+
+        if variables is not None:
+            for name, idx, statement in Table.link(result[1], variables):
+                errh.extend("tables", name, idx, "desc")
+                try:
+                    errh.error("{} is not a table or variable".format(repr(statement)))
+                finally:
+                    errh.pop(4)
+        nonterminating = Table.nonterminating(result[1])
+        for name in nonterminating:
+            errh.extend("tables", name)
+            try:
+                errh.error("every row of the table refers back to it")
+            finally:
+                errh.pop(2)
+        if variables is not None:
+            Table.inline(result[1], nonterminating)
+        return result
 
     @staticmethod
     def _loadjson(
@@ -140,17 +356,187 @@ class Table(object):
         name: "str",
         variables: "Optional[dict[str, Any]]" = None,
         tables: "Optional[dict[str, Table]]" = None,
+        rng: "Optional[dnd.rng.Source]" = None,
     ) -> "str":
         table = tables.get(name, None)
         if table is None:
             raise ValueError("table {} not found".format(repr(name)))
 
-        return table.random().template.evaluate(variables, tables)
+        if rng is None:
+            rng = dnd.rng.default
+        return table.random(rng).template.evaluate(variables, tables, rng)
+
+    @staticmethod
+    def evaluate_many(
+        name: "str",
+        n: "int",
+        variables: "Optional[dict[str, Any]]" = None,
+        tables: "Optional[dict[str, Table]]" = None,
+        rng: "Optional[dnd.rng.Source]" = None,
+    ) -> "Iterator[str]":
+        """Evaluate n random rows of a table, yielding each result lazily
+
+        See Template.evaluate_many; the table is looked up once.
+
+        :param name: The name of the table in tables
+        :param n: The number of results to generate
+        :param variables: The values to look statements up in
+        :param tables: The tables to look statements up in
+        :param rng: The source of random numbers, or None for the default
+        :returns: A generator of the results
+        """
+        table = tables.get(name, None)
+        if table is None:
+            raise ValueError("table {} not found".format(repr(name)))
+        template = dnd.template.Template.of_table(table)
+        return template.evaluate_many(n, variables, tables, rng)
+
+    @staticmethod
+    def render_into(
+        name: "str",
+        writer: "Any",
+        variables: "Optional[dict[str, Any]]" = None,
+        tables: "Optional[dict[str, Table]]" = None,
+        rng: "Optional[dnd.rng.Source]" = None,
+    ) -> None:
+        """Evaluate a random row of a table, writing it to a writer
+
+        See Template.render_into for the kinds of writer which are accepted.
+        """
+        table = tables.get(name, None)
+        if table is None:
+            raise ValueError("table {} not found".format(repr(name)))
+
+        if rng is None:
+            rng = dnd.rng.default
+        table.random(rng).template.render_into(writer, variables, tables, rng)
+
+    @staticmethod
+    def link(
+        tables: "Dict[str, Table]", variables: "Optional[Container[str]]" = None
+    ) -> "List[Tuple[str, int, str]]":
+        """Link the templates of every row of the tables
+
+        See Template.link; statements are bound to the given tables or to
+        variable slots once, rather than being looked up on every evaluation.
+
+        :param tables: The tables to link
+        :param variables: The names of the values the tables will be
+                          evaluated with
+        :returns: The table name, row index and text of each statement which
+                  could not be bound
+        """
+        unresolved = list()  # type: List[Tuple[str, int, str]]
+        for name, table in tables.items():
+            if table is None:
+                continue
+            for idx, row in enumerate(table):
+                for statement in row.template.link(tables, variables):
+                    unresolved.append((name, idx, statement))
+        return unresolved
+
+    @staticmethod
+    def nonterminating(tables: "Dict[str, Table]") -> "List[str]":
+        """Find the tables whose expansion can never finish
+
+        A row finishes once every table it refers to has finished, so a table
+        finishes if any of its rows only refers to tables which finish. The
+        tables which are left refer back to themselves on every row, and
+        always fail with an ExpansionError when evaluated. Tables which refer
+        to themselves on only some rows are not reported.
+
+        :param tables: The tables to check
+        :returns: The names of the tables which can never finish
+        """
+        refs = dict()  # type: Dict[str, Tuple[Table, List[List[Table]]]]
+        for name, table in tables.items():
+            if table is None or len(table) == 0:
+                continue
+            # A table without any weighted rows always draws its first row
+            weighted = [r for r in table if r.weight > 0] or [table[0]]
+            rows = [r.template.references(tables) for r in weighted]
+            refs[name] = (table, rows)
+
+        # Tables are compared by identity, as linked rows refer to them
+        # directly; tables which are not checked are assumed to finish
+        pending = set(table for table, _ in refs.values())
+        changed = True
+        while changed:
+            changed = False
+            for table, rows in refs.values():
+                if table not in pending:
+                    continue
+                if any(all(r not in pending for r in row) for row in rows):
+                    pending.discard(table)
+                    changed = True
+        return [name for name, (table, _) in refs.items() if table in pending]
+
+    @staticmethod
+    def inline(
+        tables: "Dict[str, Table]", exclude: "Optional[Container[str]]" = None
+    ) -> "int":
+        """Inline deterministic tables into the rows which refer to them
+
+        A table is deterministic if it has a single row, or if every row is
+        the same constant text. Linked references to deterministic tables are
+        replaced by the parts of their row, repeatedly, so that chains of them
+        are inlined completely; see Template.inline. Rendering then only
+        draws random numbers for the tables which are really random.
+
+        Tables which can never finish expanding must be excluded, as they
+        would be inlined into themselves forever. Changing an inlined table
+        with append, extend, set_weight or remove undoes the inlining of every
+        template it was inlined into, so that they draw from it again.
+
+        :param tables: The linked tables to optimize
+        :param exclude: The names of tables which must not be inlined
+        :returns: The number of passes which changed a template
+        """
+        skip = set() if exclude is None else set(exclude)
+        passes = 0
+        changed = True
+        while changed:
+            rows = dict()  # type: Dict[Table, dnd.template.Template]
+            for name, table in tables.items():
+                if table is None or name in skip or len(table) == 0:
+                    continue
+                if len(table) == 1:
+                    rows[table] = table[0].template
+                    continue
+                text = table[0].template.constant()
+                if text is not None and all(
+                    r.template.constant() == text for r in table
+                ):
+                    rows[table] = table[0].template
+
+            changed = False
+            for table in tables.values():
+                if table is None:
+                    continue
+                for row in table:
+                    if row.template.inline(rows):
+                        changed = True
+            if changed:
+                passes += 1
+
+        for table in tables.values():
+            if table is None:
+                continue
+            for row in table:
+                for inlined in row.template.inlined:
+                    inlined._inlined_into.add(row.template)
+        return passes
 
     def __init__(self, id_: "str", rows: "Optional[List[Row]]" = None) -> None:
         self._id = id_
         self._rows = list() if rows is None else rows
         self._weight = sum(r.weight for r in self._rows)
+        # The alias table used by random, built when it is first needed, and
+        # the tree which replaces it once weights are changed
+        self._alias = None  # type: Optional[Alias]
+        self._tree = None  # type: Optional[Fenwick]
+        # The templates which the row of this table was inlined into
+        self._inlined_into = set()  # type: Set[dnd.template.Template]
 
     @property
     def id(self) -> "str":
@@ -160,22 +546,182 @@ class Table(object):
     def weight(self) -> "float":
         return self._weight
 
+    def _uninline(self) -> None:
+        # The table is about to change, so copies of its row are stale
+        if len(self._inlined_into) > 0:
+            for template in self._inlined_into:
+                template.uninline()
+            self._inlined_into = set()
+
     def append(self, row: "Row") -> None:
+        self._uninline()
         self._rows.append(row)
         self._weight += row.weight
+        self._alias = None
+        self._tree = None
 
     def extend(self, rows: "List[Row]") -> None:
+        self._uninline()
         self._rows.extend(rows)
         self._weight += sum(r.weight for r in rows)
-
-    def random(self) -> "Row":
-        value = random.uniform(0, self._weight)
-        for row in self._rows:
-            if row.weight >= value:
-                return row
-            value -= row.weight
-        # Shouldn't happen, but just return the last row
-        return self._rows[-1]
+        self._alias = None
+        self._tree = None
+
+    def set_weight(self, idx: "int", weight: "Number") -> None:
+        """Change the weight of a row
+
+        The first change builds a Fenwick tree of the weights, which random
+        then draws from; every later change and draw takes O(log n) time.
+
+        :param idx: The index of the row
+        :param weight: The new weight of the row; a negative weight is never
+                       drawn, as with the weights rows are created with
+        """
+        idx = range(len(self._rows))[idx]
+        self._uninline()
+        tree = self._tree
+        if tree is None:
+            tree = Fenwick([r.weight for r in self._rows])
+        tree.set(idx, weight)
+        self._tree, self._alias = tree, None
+        row = self._rows[idx]
+        self._weight += float(weight) - row.weight
+        row.weight = weight
+
+    def decrement(self, idx: "int", amount: "Number" = 1) -> "float":
+        """Reduce the weight of a row, stopping at zero
+
+        This is how a pool is depleted as items are drawn from it.
+
+        :param idx: The index of the row
+        :param amount: How much to reduce the weight by
+        :returns: The new weight of the row
+        """
+        weight = max(self._rows[idx].weight - amount, 0)
+        self.set_weight(idx, weight)
+        return self._rows[idx].weight
+
+    def remove(self, idx: "int") -> "Row":
+        """Remove a row from the table
+
+        Removing a row shifts the rows after it, so this takes O(n) time;
+        set the weight of a row to zero to stop it from being drawn in
+        O(log n) time instead.
+
+        :param idx: The index of the row
+        :returns: The removed row
+        """
+        row = self._rows.pop(idx)
+        self._uninline()
+        self._weight = sum(r.weight for r in self._rows)
+        if self._tree is not None:
+            self._tree = Fenwick([r.weight for r in self._rows])
+        self._alias = None
+        return row
+
+    def random(self, rng: "Optional[dnd.rng.Source]" = None) -> "Row":
+        """Choose a random row, weighted by the weight of each row
+
+        Rows are drawn in constant time from an alias table, which is built
+        the first time a row is drawn after the rows change. Once the weight
+        of a row has been changed, rows are drawn from a Fenwick tree instead.
+
+        :param rng: The source of random numbers, or None for the default
+        :returns: The chosen row
+        """
+        if rng is None:
+            rng = dnd.rng.default
+        if self._tree is not None:
+            return self._rows[self._tree.draw(rng)]
+        alias = self._alias
+        if alias is None:
+            alias = self._alias = Alias([r.weight for r in self._rows])
+        return self._rows[alias.draw(rng)]
+
+    def sample(self, n: "int", rng: "Optional[dnd.rng.Source]" = None) -> "List[int]":
+        """Draw the indices of n random rows, weighted by the weight of each row
+
+        The random numbers are drawn in a single batch and looked up in the
+        cumulative weights of the rows by binary search, which is much faster
+        than calling random n times.
+
+        :param n: The number of rows to draw
+        :param rng: The source of random numbers, or None for the default
+        :returns: The index of each drawn row
+        :raises ValueError: If the table has no rows
+        """
+        if len(self._rows) == 0:
+            raise ValueError("cannot sample from an empty table")
+        if rng is None:
+            rng = dnd.rng.default
+        if n <= 0:
+            return []
+        weights = [max(r.weight, 0.0) for r in self._rows]
+        if all(w.is_integer() for w in weights):
+            cumulative = list(itertools.accumulate(int(w) for w in weights))
+            total = cumulative[-1]
+            if total == 0:
+                return [0] * n
+            draws = rng.randints(0, total - 1, n)
+        else:
+            cumulative = list(itertools.accumulate(weights))
+            total = cumulative[-1]
+            draws = [u * total for u in rng.randoms(n)]
+        indices = [bisect.bisect_right(cumulative, v) for v in draws]
+        if len(weights) in indices:
+            # Float rounding put a draw past the end; use the last weight
+            last = max(i for i, w in enumerate(weights) if w > 0)
+            return [min(i, last) for i in indices]
+        return indices
+
+    def sample_counts(
+        self, n: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[int]":
+        """Draw n random rows and count how many times each row was drawn
+
+        :param n: The number of rows to draw
+        :param rng: The source of random numbers, or None for the default
+        :returns: The number of times each row was drawn, by index
+        :raises ValueError: If the table has no rows
+        """
+        counts = [0] * len(self._rows)
+        for idx in self.sample(n, rng):
+            counts[idx] += 1
+        return counts
+
+    def sample_distinct(
+        self, k: "int", rng: "Optional[dnd.rng.Source]" = None
+    ) -> "List[Row]":
+        """Draw k distinct random rows, weighted by the weight of each row
+
+        This is the same as drawing rows one at a time and dropping each row
+        from the table once it has been drawn. Each row is given the key
+        -log(u) / weight for a uniform u, and the k rows with the smallest
+        keys are drawn in order of their keys, which takes O(n log k) time.
+        Rows without any weight are never drawn.
+
+        :param k: The number of rows to draw
+        :param rng: The source of random numbers, or None for the default
+        :returns: The drawn rows, in the order they were drawn
+        :raises ValueError: If fewer than k rows have any weight
+        """
+        if rng is None:
+            rng = dnd.rng.default
+        weighted = [r for r in self._rows if r.weight > 0]
+        if k > len(weighted):
+            raise ValueError(
+                "cannot draw {} distinct rows from {} rows with weight".format(
+                    k, len(weighted)
+                )
+            )
+        if k <= 0:
+            return []
+        # random() may return 0.0 but never 1.0, so 1.0 - u is never 0.0
+        keys = [
+            (-math.log(1.0 - u) / r.weight, i)
+            for i, (u, r) in enumerate(zip(rng.randoms(len(weighted)), weighted))
+        ]
+        return [weighted[i] for _, i in heapq.nsmallest(k, keys)]
 
     def __len__(self) -> "int":
         return len(self._rows)
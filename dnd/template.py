@@ -1,12 +1,62 @@
+import re
+
+import dnd.nodes
 import dnd.parse
+import dnd.rng
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Optional, Any
+    from typing import (  # noqa: F401
+        Any,
+        Callable,
+        Container,
+        Iterator,
+        List,
+        Optional,
+        Set,
+        Tuple,
+    )
     import dnd.table
 
 _EMPTY_DICT = dict()
+_UNBOUND = object()
+
+# The default limits on the expansion of nested tables
+MaxDepth = 10000
+MaxExpansions = 100000
+
+_delimiter_re = re.compile(r"\{\{|\}\}")
+
+
+def _text(value: "Any", rng: "dnd.rng.Source") -> "str":
+    # Callable values, e.g. a Dice object or expression node, are evaluated
+    # with the same source of random numbers as the rest of the template
+    if callable(value):
+        return str(value(rng=rng))
+    return str(value)
+
+
+class TemplateError(ValueError):
+    """An error in the text of a template at a given position"""
+
+    def __init__(self, message: "str", position: "int") -> None:
+        ValueError.__init__(self, message, position)
+
+    @property
+    def message(self) -> "str":
+        return self.args[0]
+
+    @property
+    def position(self) -> "int":
+        return self.args[1]
+
+    def __str__(self) -> "str":
+        return "{} at position {}".format(self.args[0], self.args[1])
+
+
+class ExpansionError(ValueError):
+    """An error raised when nested tables expand past a limit"""
 
 
 class Template(object):
@@ -15,24 +65,35 @@ class Template(object):
         self._parts = list()
         self._values = None  # type: Optional[dict[str, Any]]
         self._tables = None  # type: Optional[dict[str, dnd.table.Table]]
+        # The parts from before tables were inlined, and the inlined tables
+        self._uninlined = None  # type: Optional[List[Tuple[int, Any]]]
+        self._inlined = set()  # type: Set[dnd.table.Table]
 
         self._error_behavior = 0
 
-        rest = text
-        while "{{" in rest:
-            start = rest.index("{{")
-            end = rest.index("}}", start + 2)
-            statement = rest[start + 2 : end].strip()
-            strpart = rest[0:start]
-            if len(strpart) > 0:
-                self._parts.append((0, strpart))
-            rest = rest[end + 2 :]
+        # Scan the delimiters in one pass; last is the end of the previous
+        # statement and start is the position of an unclosed '{{'
+        last, start = 0, -1
+        for m in _delimiter_re.finditer(text):
+            if m.group() == "{{":
+                if start >= 0:
+                    raise TemplateError("unexpected '{{' in statement", m.start())
+                start = m.start()
+                continue
+            if start < 0:
+                raise TemplateError("unmatched '}}'", m.start())
+            if start > last:
+                self._parts.append((0, text[last:start]))
+            statement = text[start + 2 : m.start()].strip()
             try:
                 self._parts.append((1, dnd.parse.expression(statement)))
             except ValueError:
                 self._parts.append((2, statement))
-        if len(rest) > 0:
-            self._parts.append((0, rest))
+            last, start = m.end(), -1
+        if start >= 0:
+            raise TemplateError("unclosed '{{'", start)
+        if last < len(text):
+            self._parts.append((0, text[last:]))
 
     @property
     def text(self) -> "str":
@@ -63,39 +124,296 @@ class Template(object):
     def ignore_on_error(self) -> None:
         self._error_behavior = 2
 
+    @staticmethod
+    def of_table(table: "dnd.table.Table") -> "Template":
+        """Create a template which evaluates a random row of a table
+
+        :param table: The table to evaluate
+        :returns: A template which is linked to the table
+        """
+        template = Template("")
+        template._parts = [(3, table)]
+        return template
+
+    def link(
+        self,
+        tables: "dict[str, dnd.table.Table]",
+        variables: "Optional[Container[str]]" = None,
+    ) -> "List[str]":
+        """Bind each statement which names a table or variable once
+
+        Bound statements are evaluated without looking their names up, so
+        linked tables are used even if evaluate is given different tables.
+        As in evaluate, a name which is both a variable and a table is bound
+        to the variable. A value given to evaluate whose name is not in
+        variables does not replace a linked table of the same name, so the
+        name of every value must be listed. Statements which are already
+        bound are left as they are.
+
+        :param tables: The tables to bind statements to
+        :param variables: The names of the values which will be given to
+                          evaluate
+        :returns: The statements which could not be bound
+        """
+        unresolved = list()  # type: List[str]
+        parts = list()
+        for t, v in self._parts:
+            if t == 2:
+                if variables is not None and v in variables:
+                    t = 4
+                elif v in tables:
+                    t, v = 3, tables[v]
+                else:
+                    unresolved.append(v)
+            parts.append((t, v))
+        self._parts = parts
+        return unresolved
+
+    def constant(self) -> "Optional[str]":
+        """Get the text of the template if it always evaluates to the same text
+
+        :returns: The text the template evaluates to, or None if it varies
+        """
+        if any(t != 0 for t, _ in self._parts):
+            return None
+        return "".join(v for _, v in self._parts)
+
+    def inline(self, rows: "dict[dnd.table.Table, Template]") -> "bool":
+        """Replace references to deterministic tables with their parts
+
+        Linked references to a table in rows are replaced by the parts of the
+        template the table always evaluates to, constant expressions are
+        replaced by their text and adjacent text is merged. The templates in
+        rows are not inlined themselves, so references which they contain
+        are left as they are. The tables which were inlined, including those
+        inlined into their templates, are kept in inlined, and uninline
+        restores the parts the template had before.
+
+        :param rows: The template of each table which may be inlined
+        :returns: If the parts of the template changed
+        """
+        parts = list()  # type: List[Tuple[int, Any]]
+        inlined = set()  # type: Set[dnd.table.Table]
+        for t, v in self._parts:
+            if t == 3 and v in rows:
+                parts.extend(rows[v]._parts)
+                inlined.add(v)
+                inlined.update(rows[v]._inlined)
+            elif t == 1 and type(v) is dnd.nodes.Value:
+                parts.append((0, str(v.value)))
+            else:
+                parts.append((t, v))
+
+        merged = list()  # type: List[Tuple[int, Any]]
+        for t, v in parts:
+            if t == 0 and len(merged) > 0 and merged[-1][0] == 0:
+                merged[-1] = (0, merged[-1][1] + v)
+            elif t != 0 or len(v) > 0:
+                merged.append((t, v))
+        if merged == self._parts:
+            return False
+        if self._uninlined is None:
+            self._uninlined = self._parts
+        self._parts = merged
+        self._inlined.update(inlined)
+        return True
+
+    @property
+    def inlined(self) -> "Set[dnd.table.Table]":
+        return self._inlined
+
+    def uninline(self) -> None:
+        """Undo inline, so that the template refers to the tables again"""
+        if self._uninlined is not None:
+            self._parts, self._uninlined = self._uninlined, None
+            self._inlined = set()
+
+    def references(
+        self, tables: "dict[str, dnd.table.Table]"
+    ) -> "List[dnd.table.Table]":
+        """Get the tables which the template refers to
+
+        :param tables: The tables unlinked statements are looked up in
+        :returns: Each table referred to, in order
+        """
+        refs = list()  # type: List[dnd.table.Table]
+        for t, v in self._parts:
+            if t == 3:
+                refs.append(v)
+            elif t == 2 and v in tables:
+                refs.append(tables[v])
+        return refs
+
     def evaluate(
         self,
         values: "Optional[dict[str,Any]]" = None,
         tables: "Optional[dict[str, dnd.table.Table]]" = None,
+        rng: "Optional[dnd.rng.Source]" = None,
     ) -> "str":
+        parts = list()  # type: list[str]
+        self._render(parts.append, values, tables, rng, None, None)
+        return "".join(parts)
+
+    def evaluate_many(
+        self,
+        n: "int",
+        values: "Optional[dict[str,Any]]" = None,
+        tables: "Optional[dict[str, dnd.table.Table]]" = None,
+        rng: "Optional[dnd.rng.Source]" = None,
+    ) -> "Iterator[str]":
+        """Evaluate the template n times, yielding each result as it is made
+
+        The arguments are resolved once, and one buffer is reused for every
+        result, so only one result is held in memory at a time.
+
+        :param n: The number of times to evaluate the template
+        :param values: The values to look statements up in
+        :param tables: The tables to look statements up in
+        :param rng: The source of random numbers, or None for the default
+        :returns: A generator of the results
+        """
         if values is None:
             values = self._values if self._values is not None else _EMPTY_DICT
         if tables is None:
             tables = self._tables if self._tables is not None else _EMPTY_DICT
+        if rng is None:
+            rng = dnd.rng.default
+        parts = list()  # type: list[str]
+        write, join, clear = parts.append, "".join, parts.clear
+        max_depth, max_expansions = MaxDepth, MaxExpansions
+        for _ in range(n):
+            self._expand(write, values, tables, rng, max_depth, max_expansions)
+            yield join(parts)
+            clear()
 
-        result = ""
-        for t, v in self._parts:
-            if t == 0:
-                # String
-                result += v
-            elif t == 1:
-                # Dice Expression
-                result += str(v())
-            elif t == 2:
-                # Value/Table lookup
-                if v in values:
-                    try:
-                        # E.g. a Dice object or Expression Node
-                        result += str(values[v]())
-                    except Exception:
-                        result += str(values[v])
-                elif v in tables:
-                    result += tables[v].random().template.evaluate(values, tables)
-                else:
-                    # This may raise an error, or continue
-                    self._error("statement {} not in values or tables".format(repr(v)))
-                    result += "<ERROR>"
-        return result
+    def render_into(
+        self,
+        writer: "Any",
+        values: "Optional[dict[str,Any]]" = None,
+        tables: "Optional[dict[str, dnd.table.Table]]" = None,
+        rng: "Optional[dnd.rng.Source]" = None,
+        max_depth: "Optional[int]" = None,
+        max_expansions: "Optional[int]" = None,
+    ) -> None:
+        """Evaluate the template, writing each fragment to a writer
+
+        Fragments of nested tables are written to the same writer as they are
+        evaluated, so no intermediate strings are built for them. Nested
+        tables are expanded with an explicit stack rather than recursion, and
+        the expansion is limited so that a table which refers to itself fails
+        with an ExpansionError instead of running forever.
+
+        :param writer: A file-like object with a write method, or a list to
+                       append fragments to
+        :param values: The values to look statements up in; callable values
+                       are called with rng
+        :param tables: The tables to look statements up in
+        :param rng: The source of random numbers, or None for the default
+        :param max_depth: The most rows which may be part way through being
+                          expanded at once, or None for MaxDepth
+        :param max_expansions: The most rows of tables which may be expanded,
+                               or None for MaxExpansions
+        """
+        write = getattr(writer, "write", None)
+        if write is None:
+            write = writer.append
+        self._render(write, values, tables, rng, max_depth, max_expansions)
+
+    def _render(
+        self,
+        write: "Callable[[str], Any]",
+        values: "Optional[dict[str,Any]]",
+        tables: "Optional[dict[str, dnd.table.Table]]",
+        rng: "Optional[dnd.rng.Source]",
+        max_depth: "Optional[int]",
+        max_expansions: "Optional[int]",
+    ) -> None:
+        if values is None:
+            values = self._values if self._values is not None else _EMPTY_DICT
+        if tables is None:
+            tables = self._tables if self._tables is not None else _EMPTY_DICT
+        if rng is None:
+            rng = dnd.rng.default
+        if max_depth is None:
+            max_depth = MaxDepth
+        if max_expansions is None:
+            max_expansions = MaxExpansions
+        self._expand(write, values, tables, rng, max_depth, max_expansions)
+
+    def _expand(
+        self,
+        write: "Callable[[str], Any]",
+        values: "dict[str, Any]",
+        tables: "dict[str, dnd.table.Table]",
+        rng: "dnd.rng.Source",
+        max_depth: "int",
+        max_expansions: "int",
+    ) -> None:
+        # The templates and remaining parts of the rows being expanded; the
+        # template is kept so that errors are reported as it is configured
+        stack = list()  # type: List[Tuple[Template, Iterator[Tuple[int, Any]]]]
+        template, parts = self, iter(self._parts)
+        expansions = 0
+        while True:
+            for t, v in parts:
+                if t == 0:
+                    # String
+                    write(v)
+                    continue
+                elif t == 1:
+                    # Dice Expression
+                    write(str(v(rng)))
+                    continue
+                elif t == 4:
+                    # Linked Value
+                    value = values.get(v, _UNBOUND)
+                    if value is _UNBOUND:
+                        template._error("variable {} has no value".format(repr(v)))
+                        write("<ERROR>")
+                    else:
+                        write(_text(value, rng))
+                    continue
+                elif t == 2:
+                    # Value/Table lookup
+                    if v in values:
+                        write(_text(values[v], rng))
+                        continue
+                    elif v not in tables:
+                        # This may raise an error, or continue
+                        template._error(
+                            "statement {} not in values or tables".format(repr(v))
+                        )
+                        write("<ERROR>")
+                        continue
+                    v = tables[v]
+
+                # Table; rows which only refer to another table are followed
+                # in place, and plain text rows are written without being
+                # expanded
+                while True:
+                    expansions += 1
+                    if expansions > max_expansions:
+                        raise ExpansionError(
+                            "more than {} rows expanded".format(max_expansions)
+                        )
+                    row = v.random(rng).template
+                    if len(row._parts) != 1 or row._parts[0][0] != 3:
+                        break
+                    v = row._parts[0][1]
+                if len(row._parts) == 1 and row._parts[0][0] == 0:
+                    write(row._parts[0][1])
+                    continue
+                if len(stack) >= max_depth:
+                    raise ExpansionError(
+                        "tables nested more than {} deep".format(max_depth)
+                    )
+                stack.append((template, parts))
+                template, parts = row, iter(row._parts)
+                break
+            else:
+                if len(stack) == 0:
+                    return
+                template, parts = stack.pop()
 
     def _error(self, message: "str"):
         if self._error_behavior == 0:
@@ -1,11 +1,12 @@
 from dnd.roll import Dice
 import dnd.parse
+import dnd.rng
 from dnd.table import Table
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Union
+    from typing import Optional, Union
 
 
 d100 = Dice(1, 100)
@@ -18,20 +19,20 @@ d4 = Dice(1, 4)
 
 statroll = Dice(4, 6, 1)
 
-_, maze = Table.load("tables/maze.json")
-_, potions = Table.load("tables/potions.json")
-_, treasure = Table.load("tables/treasure.json")
-_, magic_weapons = Table.load("tables/magic-weapons.json")
+_, maze = Table.load("tables/maze.json", variables=())
+_, potions = Table.load("tables/potions.json", variables=())
+_, treasure = Table.load("tables/treasure.json", variables=())
+_, magic_weapons = Table.load("tables/magic-weapons.json", variables=())
 
 _tables = [maze, potions, treasure, magic_weapons]
 
 
-def table(name, group=None):
+def table(name, group=None, rng: "Optional[dnd.rng.Source]" = None):
     if group is None:
         for g in _tables:
             if name in g:
                 group = g
-    return Table.evaluate(name, None, group)
+    return Table.evaluate(name, None, group, rng)
 
 
 def gen_statblock():
@@ -42,5 +43,5 @@ def parse(expr: "str"):
     return dnd.parse.expression(expr)
 
 
-def roll(expr: "str") -> "Union[int, float]":
-    return dnd.parse.expression(expr)()
+def roll(expr: "str", rng: "Optional[dnd.rng.Source]" = None) -> "Union[int, float]":
+    return dnd.parse.expression(expr)(rng)
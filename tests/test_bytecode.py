@@ -0,0 +1,51 @@
+import pickle
+import unittest
+
+import dnd.bytecode
+import dnd.parse
+import dnd.rng
+
+
+class TestProgram(unittest.TestCase):
+    def test_matches_tree(self):
+        for expr in ("3d6 + 2", "4d6L1 * 2 - 1d4", "-(1d8) // 3 ** 2", "2d20H1 % 7"):
+            node = dnd.parse.expression(expr, simplify=False)
+            program = dnd.parse.bytecode(expr)
+            for seed in range(10):
+                self.assertEqual(
+                    program(dnd.rng.RandomSource.seeded(seed)),
+                    node(dnd.rng.RandomSource.seeded(seed)),
+                )
+
+    def test_postfix(self):
+        program = dnd.parse.bytecode("1 + 2 * -3 - 4d6L1")
+        self.assertEqual(str(program), "1 2 3 neg * + 4d6L1 -")
+        self.assertEqual(program.depth, 3)
+        self.assertEqual(program.constants[:2], (1, 2))
+
+    def test_shared_constants(self):
+        program = dnd.parse.bytecode("1d6 + 1d6 + 1 + 1.0")
+        self.assertEqual(len(program.constants), 3)
+
+    def test_deep(self):
+        program = dnd.parse.bytecode(" + ".join(["1d6"] * 20000))
+        self.assertEqual(program.depth, 2)
+        self.assertTrue(20000 <= program() <= 120000)
+
+    def test_pickle(self):
+        program = dnd.parse.bytecode("(1d4 + 2) * 1.5")
+        copy = pickle.loads(pickle.dumps(program))
+        self.assertEqual(str(copy), str(program))
+        self.assertEqual(copy.code, program.code)
+
+    def test_errors(self):
+        for expr in ("", "1 +", "-", "1 2", "(1"):
+            with self.assertRaises(ValueError):
+                dnd.parse.bytecode(expr)
+
+    def test_flatten(self):
+        node = dnd.parse.expression("1d6 + 1d6 + (2 + 3)")
+        program = dnd.bytecode.flatten(node)
+        self.assertEqual(str(program), "2d6 5 +")
+        rng = dnd.rng.RandomSource.seeded(3)
+        self.assertEqual(program(rng), node(dnd.rng.RandomSource.seeded(3)))
@@ -0,0 +1,64 @@
+import gc
+import pickle
+import unittest
+
+import dnd.codegen
+import dnd.nodes
+import dnd.parse
+import dnd.rng
+import dnd.roll
+
+
+class TestCompileNode(unittest.TestCase):
+    def _check(self, node):
+        compiled = dnd.codegen.compile_node(node)
+        for seed in range(10):
+            expected = node(dnd.rng.RandomSource.seeded(seed))
+            actual = compiled(dnd.rng.RandomSource.seeded(seed))
+            self.assertEqual(expected, actual)
+
+    def test_constants(self):
+        self.assertEqual(dnd.codegen.compile_node(dnd.parse.expression("2+3*4"))(), 14)
+        self.assertEqual(dnd.codegen.compile_node(dnd.parse.expression("-2**2"))(), 4)
+        self.assertEqual(dnd.codegen.compile_node(dnd.parse.expression("1.5*2"))(), 3.0)
+
+    def test_negative_value(self):
+        node = dnd.nodes.Power(dnd.nodes.Value(-3), dnd.nodes.Value(2))
+        self.assertEqual(dnd.codegen.compile_node(node)(), 9)
+
+    def test_matches_tree(self):
+        for expr in ("1d20 + 5", "3d6 - 1d4 * 2", "(1d8 + 2) // 3", "10 % 1d6"):
+            self._check(dnd.parse.expression(expr, cached=False))
+
+    def test_dice_drops(self):
+        self._check(dnd.nodes.Dice(dnd.roll.Dice(4, 6, 1)))
+        self._check(dnd.nodes.Dice(dnd.roll.Dice(5, 6, 1, 2)))
+        self._check(dnd.nodes.Dice(dnd.roll.Dice(2, 6, 2, 2)))
+        self._check(dnd.nodes.Dice(dnd.roll.Dice(0, 6)))
+
+    def test_cached_on_tree(self):
+        node = dnd.parse.expression("2d6 + 1", cached=False)
+        self.assertIs(dnd.codegen.compile_node(node), dnd.codegen.compile_node(node))
+
+    def test_pickle_cached_tree(self):
+        node = dnd.parse.expression("3d6 + 2")
+        dnd.codegen.compile_node(node)
+        copy = pickle.loads(pickle.dumps(node))
+        self.assertEqual(copy, node)
+        self.assertEqual(copy.min(), 5)
+
+    def test_cache_dropped(self):
+        node = dnd.parse.expression("2d6 * 3", cached=False)
+        dnd.codegen.compile_node(node)
+        key = id(node)
+        self.assertIn(key, dnd.codegen._compiled)
+        del node
+        gc.collect()
+        self.assertNotIn(key, dnd.codegen._compiled)
+
+    def test_deep_tree(self):
+        node = dnd.nodes.Value(1)
+        for _ in range(5000):
+            node = dnd.nodes.Add(node, dnd.nodes.Value(1))
+        self.assertIs(dnd.codegen.compile_node(node), node)
+        self.assertNotIn(id(node), dnd.codegen._compiled)
@@ -0,0 +1,137 @@
+import collections
+import fractions
+import itertools
+import operator
+import time
+import unittest
+
+import dnd.dist
+import dnd.roll
+
+
+def _brute_force(count, sides, droplow, drophigh):
+    weights = collections.Counter()
+    for values in itertools.product(range(1, sides + 1), repeat=count):
+        values = sorted(values)
+        weights[sum(values[droplow : count - drophigh])] += 1
+    return dict(weights)
+
+
+class TestDistribution(unittest.TestCase):
+    def test_constant(self):
+        d = dnd.dist.Distribution.constant(5)
+        self.assertEqual(d.min(), 5)
+        self.assertEqual(d.max(), 5)
+        self.assertEqual(d.mean(), 5)
+        self.assertEqual(d.variance(), 0)
+        self.assertEqual(d.probability(5), 1.0)
+
+    def test_drops_zero_weights(self):
+        d = dnd.dist.Distribution({1: 1, 2: 0, 3: 3})
+        self.assertEqual(list(d), [1, 3])
+        self.assertEqual(d.total, 4)
+        self.assertEqual(d.fraction(3), fractions.Fraction(3, 4))
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            dnd.dist.Distribution({})
+
+    def test_at_least_at_most(self):
+        d = dnd.dist.Distribution({1: 1, 2: 1, 3: 2})
+        self.assertEqual(d.at_least(2), 0.75)
+        self.assertEqual(d.at_most(2), 0.5)
+
+
+class TestDiceDistribution(unittest.TestCase):
+    def test_no_drops(self):
+        for count, sides in ((1, 6), (3, 6), (2, 20), (4, 4)):
+            d = dnd.roll.Dice(count, sides).distribution()
+            self.assertEqual(d.weights, _brute_force(count, sides, 0, 0))
+
+    def test_drops(self):
+        for args in ((4, 6, 1, 0), (4, 6, 0, 2), (5, 4, 1, 1), (2, 20, 1, 0)):
+            d = dnd.roll.Dice(*args).distribution()
+            self.assertEqual(d.weights, _brute_force(*args))
+
+    def test_drops_both_methods(self):
+        # Small pools with many sides are counted in sorted order, larger
+        # pools by their outermost kept dice
+        for args in ((3, 12, 1, 1), (6, 3, 2, 1), (7, 2, 0, 3), (5, 5, 2, 2)):
+            self.assertEqual(dnd.dist.dice(*args).weights, _brute_force(*args))
+        for count, sides in ((5, 4), (6, 3)):
+            for droplow in range(count):
+                for drophigh in range(count - droplow):
+                    args = (count, sides, droplow, drophigh)
+                    size = ((sides**count).bit_length() + 8) // 8
+                    self.assertEqual(
+                        dnd.dist._sweep(*args, size),
+                        dnd.dist._thresholds(*args, size),
+                    )
+
+    def test_large_pool_drops(self):
+        start = time.perf_counter()
+        d = dnd.roll.Dice(300, 6, 1).distribution()
+        self.assertEqual((d.total, d.min(), d.max()), (6**300, 299, 1794))
+        d = dnd.roll.Dice(200, 6, 10, 10).distribution()
+        self.assertEqual((d.total, d.min(), d.max()), (6**200, 180, 1080))
+        self.assertAlmostEqual(d.mean(), 630.0)
+        self.assertLess(time.perf_counter() - start, 10.0)
+
+    def test_larger_pool_drops(self):
+        start = time.perf_counter()
+        d = dnd.dist.dice(200, 20, 1, 1)
+        self.assertEqual((d.total, d.min(), d.max()), (20**200, 198, 3960))
+        self.assertAlmostEqual(d.mean(), 2079.0)
+        d = dnd.dist.dice(1000, 6, 10, 0)
+        self.assertEqual((d.total, d.min(), d.max()), (6**1000, 990, 5940))
+        self.assertLess(time.perf_counter() - start, 10.0)
+
+    def test_all_dropped(self):
+        d = dnd.roll.Dice(3, 6, 2, 1).distribution()
+        self.assertEqual(list(d), [0])
+        self.assertEqual(d.total, 216)
+
+    def test_statroll(self):
+        d = dnd.roll.Dice(4, 6, 1).distribution()
+        self.assertEqual(d.min(), 3)
+        self.assertEqual(d.max(), 18)
+        self.assertEqual(d.fraction(18), fractions.Fraction(21, 1296))
+        self.assertAlmostEqual(d.mean(), 15869 / 1296)
+
+    def test_memoized(self):
+        self.assertIs(
+            dnd.roll.Dice(4, 6, 1).distribution(), dnd.roll.Dice(4, 6, 1).distribution()
+        )
+
+    def test_large_pool(self):
+        d = dnd.roll.Dice(300, 6).distribution()
+        self.assertEqual(d.total, 6**300)
+        self.assertAlmostEqual(d.mean(), 1050.0)
+        self.assertAlmostEqual(d.variance(), 300 * 35 / 12)
+
+
+class TestCombine(unittest.TestCase):
+    def test_convolve_matches_pairs(self):
+        a = dnd.dist.dice(3, 6, 0, 0)
+        b = dnd.dist.dice(2, 4, 1, 0).map(lambda v: v * 3)
+        for op in (operator.add, operator.sub):
+            expected = dict()
+            for x, wx in a.weights.items():
+                for y, wy in b.weights.items():
+                    v = op(x, y)
+                    expected[v] = expected.get(v, 0) + wx * wy
+            self.assertEqual(dnd.dist.combine(op, a, b).weights, expected)
+
+    def test_too_many_pairs(self):
+        a = dnd.dist.dice(1, 100, 0, 0)
+        limit = dnd.dist.MaxPairs
+        dnd.dist.MaxPairs = 100
+        try:
+            self.assertIsNone(dnd.dist.combine(operator.mul, a, a))
+            self.assertIsNotNone(dnd.dist.combine(operator.add, a, a))
+        finally:
+            dnd.dist.MaxPairs = limit
+
+    def test_map(self):
+        d = dnd.dist.dice(2, 6, 0, 0).map(lambda v: v % 2)
+        self.assertEqual(d.weights, {0: 18, 1: 18})
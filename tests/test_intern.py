@@ -0,0 +1,71 @@
+import math
+import pickle
+import unittest
+
+import dnd.intern
+import dnd.nodes
+import dnd.parse
+import dnd.roll
+
+
+class TestEquality(unittest.TestCase):
+    def test_structural(self):
+        a = dnd.parse.expression("1d6 + 2 * 1d4L1", cached=False)
+        b = dnd.parse.expression("1d6 + 2 * 1d4L1", cached=False)
+        self.assertIsNot(a, b)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, dnd.parse.expression("1d6 + 2 * 1d4", cached=False))
+        self.assertNotEqual(a, dnd.parse.expression("2 * 1d4L1 + 1d6", cached=False))
+
+    def test_values(self):
+        Value = dnd.nodes.Value
+        self.assertNotEqual(Value(1), Value(1.0))
+        self.assertNotEqual(Value(0.0), Value(-0.0))
+        self.assertEqual(Value(math.nan), Value(math.nan))
+
+    def test_dice(self):
+        self.assertEqual(dnd.roll.Dice(4, 6, 1), dnd.roll.Dice(4, 6, 1, 0))
+        self.assertNotEqual(dnd.roll.Dice(4, 6, 1), dnd.roll.Dice(4, 6, 0, 1))
+        self.assertEqual(len({dnd.roll.Dice(1, 6), dnd.roll.Dice(1, 6)}), 1)
+
+
+class TestInternTable(unittest.TestCase):
+    def test_shares_subtrees(self):
+        table = dnd.intern.InternTable()
+        a = table.intern(dnd.parse.expression("(1d6 + 1) * 1d8", cached=False))
+        b = table.intern(dnd.parse.expression("(1d6 + 1) // 1d4", cached=False))
+        self.assertIs(a.lhs, b.lhs)
+        self.assertIs(a.lhs.lhs.dice, b.lhs.lhs.dice)
+        self.assertIsNot(a.rhs, b.rhs)
+        self.assertEqual(table.hits, 4)
+        self.assertGreater(table.saved, 0)
+
+    def test_shares_within_tree(self):
+        table = dnd.intern.InternTable()
+        node = table.intern(dnd.parse.expression("1d6 * 1d6", cached=False))
+        self.assertIs(node.lhs, node.rhs)
+        self.assertIs(table.intern(dnd.nodes.Dice(dnd.roll.Dice(1, 6))), node.lhs)
+
+    def test_entries_are_weak(self):
+        table = dnd.intern.InternTable()
+        node = table.intern(dnd.parse.expression("1d6 + 1d4 * 2", cached=False))
+        self.assertGreater(len(table), 0)
+        del node
+        self.assertEqual(len(table), 0)
+        table.intern(dnd.parse.expression("3", cached=False))
+        table.clear()
+        self.assertEqual((len(table), table.hits, table.misses), (0, 0, 0))
+
+    def test_deep_tree(self):
+        node = dnd.nodes.Value(1)
+        for _ in range(10000):
+            node = dnd.nodes.Multiply(node, dnd.nodes.Dice(dnd.roll.Dice(1, 6)))
+        table = dnd.intern.InternTable()
+        shared = table.intern(node)
+        self.assertIs(shared.rhs, shared.lhs.rhs)
+
+    def test_pickle(self):
+        node = dnd.parse.expression("1d6 + 1d4 * 2")
+        copy = pickle.loads(pickle.dumps(node))
+        self.assertEqual(copy, node)
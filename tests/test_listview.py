@@ -0,0 +1,65 @@
+import array
+import unittest
+
+import dnd.listview
+
+
+class TestListView(unittest.TestCase):
+    def setUp(self):
+        self.values = array.array("i", [1, 2, 3, 4, 5, 6])
+
+    def test_len(self):
+        self.assertEqual(len(dnd.listview.ListView(self.values, 1, 4)), 3)
+        self.assertEqual(len(dnd.listview.ListView(self.values, 0, 0)), 0)
+        self.assertEqual(len(dnd.listview.ListView(self.values, 4, 2)), 0)
+
+    def test_iter(self):
+        view = dnd.listview.ListView(self.values, 1, 4)
+        self.assertEqual(list(view), [2, 3, 4])
+        self.assertEqual(list(view), [2, 3, 4])
+
+    def test_getitem(self):
+        view = dnd.listview.ListView(self.values, 1, 4)
+        self.assertEqual(view[0], 2)
+        self.assertEqual(view[-1], 4)
+        with self.assertRaises(IndexError):
+            view[3]
+
+    def test_contains(self):
+        view = dnd.listview.ListView(self.values, 1, 4)
+        self.assertIn(3, view)
+        self.assertNotIn(1, view)
+        self.assertNotIn(5, view)
+
+    def test_str(self):
+        self.assertEqual(str(dnd.listview.ListView(self.values, 1, 4)), "[2, 3, 4]")
+
+
+class TestHistogramView(unittest.TestCase):
+    def setUp(self):
+        # The sorted values [1, 3, 3, 4, 4, 4]
+        self.counts = [1, 0, 2, 3]
+
+    def test_len(self):
+        self.assertEqual(len(dnd.listview.HistogramView(self.counts, 1, 5)), 4)
+        self.assertEqual(len(dnd.listview.HistogramView(self.counts, 4, 2)), 0)
+
+    def test_iter(self):
+        view = dnd.listview.HistogramView(self.counts, 1, 5)
+        self.assertEqual(list(view), [3, 3, 4, 4])
+
+    def test_getitem(self):
+        view = dnd.listview.HistogramView(self.counts, 1, 5)
+        self.assertEqual(view[0], 3)
+        self.assertEqual(view[2], 4)
+        self.assertEqual(view[-1], 4)
+        with self.assertRaises(IndexError):
+            view[4]
+
+    def test_contains(self):
+        view = dnd.listview.HistogramView(self.counts, 1, 5)
+        self.assertIn(3, view)
+        self.assertIn(4, view)
+        self.assertNotIn(1, view)
+        self.assertNotIn(2, view)
+        self.assertNotIn(7, view)
@@ -0,0 +1,173 @@
+import math
+import unittest
+
+import dnd.dist
+import dnd.nodes
+import dnd.parse
+import dnd.rng
+import dnd.roll
+
+
+def _stats(expr):
+    node = dnd.parse.expression(expr)
+    return node.min(), node.max(), node.mean(), node.variance()
+
+
+class TestNodeStatistics(unittest.TestCase):
+    def test_value(self):
+        self.assertEqual(_stats("5"), (5, 5, 5, 0))
+
+    def test_dice(self):
+        lo, hi, mean, var = _stats("3d6")
+        self.assertEqual((lo, hi), (3, 18))
+        self.assertAlmostEqual(mean, 10.5)
+        self.assertAlmostEqual(var, 3 * 35 / 12)
+
+    def test_dice_drops(self):
+        node = dnd.nodes.Dice(dnd.roll.Dice(4, 6, 1))
+        self.assertEqual((node.min(), node.max()), (3, 18))
+        self.assertAlmostEqual(node.mean(), 15869 / 1296)
+
+    def test_add_subtract(self):
+        lo, hi, mean, var = _stats("2d6 + 3 - 1d4")
+        self.assertEqual((lo, hi), (1, 14))
+        self.assertAlmostEqual(mean, 7.5)
+        self.assertAlmostEqual(var, 2 * 35 / 12 + 15 / 12)
+
+    def test_negative(self):
+        lo, hi, mean, var = _stats("-1d6")
+        self.assertEqual((lo, hi), (-6, -1))
+        self.assertAlmostEqual(mean, -3.5)
+        self.assertAlmostEqual(var, 35 / 12)
+
+    def test_multiply(self):
+        lo, hi, mean, var = _stats("2 * 1d6")
+        self.assertEqual((lo, hi), (2, 12))
+        self.assertAlmostEqual(mean, 7.0)
+        self.assertAlmostEqual(var, 4 * 35 / 12)
+
+        lo, hi, mean, var = _stats("1d4 * 1d4")
+        self.assertEqual((lo, hi), (1, 16))
+        self.assertAlmostEqual(mean, 6.25)
+        values = [a * b for a in range(1, 5) for b in range(1, 5)]
+        exact = sum((v - 6.25) ** 2 for v in values) / 16
+        self.assertAlmostEqual(var, exact)
+
+    def test_divide(self):
+        lo, hi, mean, var = _stats("1d6 / 2")
+        self.assertEqual((lo, hi), (0.5, 3.0))
+        self.assertAlmostEqual(mean, 1.75)
+        self.assertAlmostEqual(var, 35 / 48)
+
+    def test_divide_by_zero_range(self):
+        node = dnd.parse.expression("1 / (1d6 - 3)")
+        self.assertEqual((node.min(), node.max()), (-math.inf, math.inf))
+        with self.assertRaises(ValueError):
+            node.mean()
+
+    def test_floordiv(self):
+        node = dnd.parse.expression("1d6 // 2")
+        self.assertEqual((node.min(), node.max()), (0, 3))
+        self.assertAlmostEqual(node.mean(), 1.5)
+        self.assertAlmostEqual(node.variance(), 11 / 12)
+        self.assertEqual(_stats("7 // 2"), (3, 3, 3, 0))
+
+    def test_modulo(self):
+        node = dnd.parse.expression("1d20 % 6")
+        self.assertEqual((node.min(), node.max()), (0, 5))
+        node = dnd.parse.expression("1d3 % 6")
+        self.assertEqual((node.min(), node.max()), (1, 3))
+        node = dnd.parse.expression("1d6 % 3")
+        self.assertAlmostEqual(node.mean(), 1)
+        self.assertAlmostEqual(node.variance(), 2 / 3)
+
+    def test_power(self):
+        node = dnd.parse.expression("1d6 ** 2")
+        self.assertEqual((node.min(), node.max()), (1, 36))
+        node = dnd.parse.expression("(1d6 - 3) ** 2")
+        self.assertEqual((node.min(), node.max()), (0, 9))
+        self.assertEqual(_stats("2 ** 3"), (8, 8, 8, 0))
+        node = dnd.parse.expression("2 ** 1d4")
+        self.assertAlmostEqual(node.mean(), 7.5)
+        self.assertAlmostEqual(node.variance(), 28.75)
+
+    def test_power_negative_base(self):
+        for expr in ("(1d6 - 4) ** 1d3", "(1d6 - 4) ** (1d4 - 1)", "(1d4 - 5) ** 1d4"):
+            node = dnd.parse.expression(expr)
+            dist = node.distribution()
+            self.assertLessEqual(node.min(), dist.min())
+            self.assertGreaterEqual(node.max(), dist.max())
+        node = dnd.parse.expression("(1d6 - 4) ** 1d3")
+        self.assertEqual((node.min(), node.max()), (-27, 9))
+
+
+class TestEvaluateBatch(unittest.TestCase):
+    def test_values_in_range(self):
+        rng = dnd.rng.RandomSource.seeded(7)
+        for expr in ("3d6 + 2", "4d6L1 * 2 - 1d4", "-(1d8) // 3", "1d6 ** 2 % 7"):
+            node = dnd.parse.expression(expr)
+            samples = node.evaluate_batch(500, rng)
+            self.assertEqual(len(samples), 500)
+            self.assertGreaterEqual(min(samples), node.min())
+            self.assertLessEqual(max(samples), node.max())
+
+    def test_mean(self):
+        samples = dnd.parse.expression("3d6 + 2").evaluate_batch(
+            20000, dnd.rng.RandomSource.seeded(3)
+        )
+        self.assertAlmostEqual(sum(samples) / len(samples), 12.5, delta=0.1)
+
+    def test_constant_and_empty(self):
+        node = dnd.parse.expression("1 / 4")
+        self.assertEqual(node.evaluate_batch(3), [0.25, 0.25, 0.25])
+        self.assertEqual(dnd.parse.expression("2d4 + 1").evaluate_batch(0), [])
+
+    def test_reproducible(self):
+        node = dnd.parse.expression("2d20H1 - 1d4")
+        a = node.evaluate_batch(100, dnd.rng.RandomSource.seeded(5))
+        b = node.evaluate_batch(100, dnd.rng.RandomSource.seeded(5))
+        self.assertEqual(a, b)
+
+    def test_divide_by_zero(self):
+        node = dnd.nodes.Divide(dnd.nodes.Value(1), dnd.nodes.Value(0))
+        with self.assertRaises(ZeroDivisionError):
+            node.evaluate_batch(2)
+
+
+class TestDistribution(unittest.TestCase):
+    def test_matches_statistics(self):
+        for expr in ("3d6 + 2", "4d6L1 * 2 - 1d4", "-(1d8) + 2d4", "1d6 * 1d4"):
+            node = dnd.parse.expression(expr)
+            dist = node.distribution()
+            self.assertEqual((dist.min(), dist.max()), (node.min(), node.max()))
+            self.assertAlmostEqual(dist.mean(), node.mean())
+            self.assertAlmostEqual(dist.variance(), node.variance())
+
+    def test_exact(self):
+        dist = dnd.parse.expression("1d20 + 5").distribution()
+        self.assertEqual(dist.at_least(15), 0.55)
+        dist = dnd.parse.expression("1d6 // 2").distribution()
+        self.assertEqual(dist.weights, {0: 1, 1: 2, 2: 2, 3: 1})
+        dist = dnd.parse.expression("1d8 % 3").distribution()
+        self.assertEqual(dist.weights, {0: 2, 1: 3, 2: 3})
+        dist = dnd.parse.expression("1d2 / 1d2").distribution()
+        self.assertEqual(dist.weights, {0.5: 1, 1.0: 2, 2.0: 1})
+
+    def test_cached_by_structure(self):
+        a = dnd.parse.expression("2d6 * 1d4 - 1", cached=False)
+        b = dnd.parse.expression("2d6 * 1d4 - 1", cached=False)
+        self.assertIs(a.distribution(), b.distribution())
+
+    def test_divide_by_zero(self):
+        with self.assertRaises(ValueError):
+            dnd.parse.expression("1d6 / (1d4 - 1)").distribution()
+
+    def test_sampled(self):
+        limit = dnd.dist.MaxPairs
+        dnd.dist.MaxPairs = 10
+        try:
+            dist = dnd.parse.expression("1d6 * 1d8 + 1", cached=False).distribution()
+        finally:
+            dnd.dist.MaxPairs = limit
+        self.assertEqual(dist.total, dnd.nodes.DistributionSamples)
+        self.assertAlmostEqual(dist.mean(), 3.5 * 4.5 + 1, delta=0.2)
@@ -0,0 +1,98 @@
+import unittest
+
+import dnd.parse
+
+
+class TestExpressionCache(unittest.TestCase):
+    def test_hit_returns_shared_tree(self):
+        c = dnd.parse.ExpressionCache(4)
+        a = c.get("1d6 + 2")
+        b = c.get("1d6 + 2")
+        self.assertIs(a, b)
+        self.assertEqual((c.hits, c.misses), (1, 1))
+
+    def test_eviction(self):
+        c = dnd.parse.ExpressionCache(2)
+        c.get("1")
+        c.get("2")
+        c.get("1")
+        c.get("3")
+        self.assertEqual(c.evictions, 1)
+        self.assertIn("1", c)
+        self.assertNotIn("2", c)
+        self.assertEqual(len(c), 2)
+
+    def test_failures_cached(self):
+        c = dnd.parse.ExpressionCache(2)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                c.get("some-table")
+        self.assertEqual((c.hits, c.misses), (1, 1))
+
+    def test_clear(self):
+        c = dnd.parse.ExpressionCache(2)
+        c.get("1")
+        c.get("1")
+        c.clear()
+        self.assertEqual(len(c), 0)
+        self.assertEqual((c.hits, c.misses, c.evictions), (0, 0, 0))
+
+    def test_zero_size(self):
+        c = dnd.parse.ExpressionCache(0)
+        self.assertEqual(c.get("1d6"), c.get("1d6"))
+        self.assertEqual((len(c), c.hits, c.misses), (0, 0, 2))
+
+    def test_expression_bypass(self):
+        a = dnd.parse.expression("2d8 + 1")
+        self.assertIs(a, dnd.parse.expression("2d8 + 1"))
+        self.assertIsNot(a, dnd.parse.expression("2d8 + 1", cached=False))
+
+
+class TestExpression(unittest.TestCase):
+    def test_left_associative(self):
+        self.assertEqual(dnd.parse.expression("2 - 3 - 4")(), -5)
+        self.assertEqual(dnd.parse.expression("12 / 2 / 3")(), 2.0)
+
+    def test_precedence(self):
+        self.assertEqual(dnd.parse.expression("2 * 3 - 1")(), 5)
+        self.assertEqual(dnd.parse.expression("1 - 2 * 3")(), -5)
+        self.assertEqual(dnd.parse.expression("2 * -3 - 1")(), -7)
+        self.assertEqual(dnd.parse.expression("2 ** 3 ** 2")(), 512)
+
+    def test_unary_minus(self):
+        self.assertEqual(dnd.parse.expression("-2 - 3")(), -5)
+        self.assertEqual(dnd.parse.expression("2 - -3")(), 5)
+        self.assertEqual(dnd.parse.expression("-(1 + 2) * 3")(), -9)
+
+    def test_str_round_trip(self):
+        for expr in ("1d6 - (1d4 - 1d8)", "1d6 / (1d4 * 2)", "(1d4**1d4)**1d2"):
+            node = dnd.parse.expression(expr)
+            self.assertEqual(str(dnd.parse.expression(str(node))), str(node))
+
+    def test_missing_operand(self):
+        for expr in ("1 +", "* 2", "-"):
+            with self.assertRaises(ValueError):
+                dnd.parse.expression(expr, cached=False)
+
+
+class TestLex(unittest.TestCase):
+    def test_matches_tokenize(self):
+        for expr in ("4d6 + 2 * 1.5", "(1d8 + 3) // 2 ** 2 % 3", "1e3 - 2.5e-1"):
+            self.assertEqual(repr(dnd.parse.lex(expr)), repr(dnd.parse.tokenize(expr)))
+
+    def test_drops(self):
+        tokens = dnd.parse.lex("4d6L1 + 5d8H1L2")
+        self.assertEqual(tokens[0][1].droplow, 1)
+        self.assertEqual(tokens[2][1].droplow, 2)
+        self.assertEqual(tokens[2][1].drophigh, 1)
+
+    def test_whitespace(self):
+        self.assertEqual(dnd.parse.lex("  1 +\t2  "), dnd.parse.lex("1+2"))
+        self.assertEqual(dnd.parse.lex("   "), [])
+
+    def test_errors(self):
+        for expr in ("2x", "1.", "1d", "4d6L1L1"):
+            with self.assertRaises(ValueError):
+                dnd.parse.lex(expr)
+        with self.assertRaises(ValueError):
+            dnd.parse.expression("", cached=False)
@@ -0,0 +1,98 @@
+import random
+import unittest
+
+import dnd.rng
+
+
+class _CountingSource(dnd.rng.Source):
+    """A deterministic source which counts the bulk draws made from it"""
+
+    def __init__(self):
+        self.calls = 0
+        self._next = 0
+
+    def random(self):
+        self._next += 1
+        return (self._next % 100) / 100.0
+
+    def randint(self, a, b):
+        self._next += 1
+        return a + self._next % (b - a + 1)
+
+    def randoms(self, n):
+        self.calls += 1
+        return dnd.rng.Source.randoms(self, n)
+
+    def randints(self, a, b, n):
+        self.calls += 1
+        return dnd.rng.Source.randints(self, a, b, n)
+
+
+class TestRandomSource(unittest.TestCase):
+    def test_seeded_reproducible(self):
+        a = dnd.rng.RandomSource.seeded(42)
+        b = dnd.rng.RandomSource(random.Random(42))
+        self.assertEqual(a.randints(1, 6, 20), b.randints(1, 6, 20))
+        self.assertEqual(a.randoms(5), b.randoms(5))
+
+    def test_ranges(self):
+        src = dnd.rng.RandomSource.seeded(1)
+        self.assertTrue(all(1 <= v <= 6 for v in src.randints(1, 6, 1000)))
+        self.assertTrue(all(0.0 <= v < 1.0 for v in src.randoms(1000)))
+        self.assertTrue(2.0 <= src.uniform(2.0, 3.0) <= 3.0)
+        self.assertTrue(1 <= src.randint(1, 4) <= 4)
+
+    def test_wide_range(self):
+        src = dnd.rng.RandomSource.seeded(1)
+        values = src.randints(1, 2**70, 200)
+        self.assertTrue(all(1 <= v <= 2**70 for v in values))
+        self.assertTrue(any(v % 2 == 1 for v in values))
+        self.assertTrue(any(v % 2 == 0 for v in values))
+
+
+class TestBufferedSource(unittest.TestCase):
+    def test_randint_buffered(self):
+        inner = _CountingSource()
+        src = dnd.rng.BufferedSource(inner, 16)
+        values = [src.randint(1, 6) for _ in range(32)]
+        self.assertEqual(inner.calls, 2)
+        self.assertTrue(all(1 <= v <= 6 for v in values))
+
+    def test_random_buffered(self):
+        inner = _CountingSource()
+        src = dnd.rng.BufferedSource(inner, 16)
+        values = [src.random() for _ in range(16)]
+        self.assertEqual(inner.calls, 1)
+        self.assertTrue(all(0.0 <= v < 1.0 for v in values))
+
+    def test_bulk(self):
+        inner = _CountingSource()
+        src = dnd.rng.BufferedSource(inner, 16)
+        self.assertEqual(len(src.randints(1, 6, 10)), 10)
+        self.assertEqual(len(src.randints(1, 6, 10)), 10)
+        self.assertEqual(len(src.randints(1, 6, 0)), 0)
+        self.assertEqual(len(src.randints(1, 6, 100)), 100)
+        self.assertEqual(len(src.randoms(10)), 10)
+        self.assertEqual(len(src.randoms(0)), 0)
+
+    def test_separate_ranges(self):
+        src = dnd.rng.BufferedSource(dnd.rng.RandomSource.seeded(3), 8)
+        for _ in range(20):
+            self.assertTrue(1 <= src.randint(1, 4) <= 4)
+            self.assertTrue(1 <= src.randint(1, 20) <= 20)
+
+    def test_changing_ranges(self):
+        inner = _CountingSource()
+        src = dnd.rng.BufferedSource(inner, 4096)
+        for total in range(1000, 0, -1):
+            self.assertTrue(0 <= src.randint(0, total - 1) < total)
+        self.assertLessEqual(len(src._ints), dnd.rng.MaxRanges)
+        unused = sum(len(buf) for buf in src._ints.values())
+        self.assertLess(unused, dnd.rng.MaxRanges * 16)
+
+    def test_block_grows(self):
+        inner = _CountingSource()
+        src = dnd.rng.BufferedSource(inner, 64)
+        values = [src.randint(1, 6) for _ in range(16 + 32 + 64 + 64)]
+        self.assertEqual(inner.calls, 4)
+        self.assertTrue(all(1 <= v <= 6 for v in values))
@@ -0,0 +1,158 @@
+import random
+import unittest
+
+import dnd.rng
+import dnd.roll
+
+
+class TestRoll(unittest.TestCase):
+    def test_result(self):
+        self.assertEqual(dnd.roll.Roll([1, 3, 4, 6], 1, 0).result, 13)
+        self.assertEqual(dnd.roll.Roll([1, 3, 4, 6], 1, 1).result, 7)
+        self.assertEqual(dnd.roll.Roll([1, 3, 4, 6], 3, 3).result, 0)
+
+    def test_views(self):
+        r = dnd.roll.Roll([1, 3, 4, 6], 1, 1)
+        self.assertEqual(list(r.dropped_low), [1])
+        self.assertEqual(list(r.values), [3, 4])
+        self.assertEqual(list(r.dropped_high), [6])
+        self.assertEqual(len(r.values), 2)
+
+    def test_repr_str(self):
+        r = dnd.roll.Roll([1, 3, 4, 6], 1, 0)
+        self.assertEqual(repr(r), "Roll([1, 3, 4, 6], 1, 0)")
+        self.assertEqual(str(r), "13 = [[1], [3, 4, 6], []]")
+
+    def test_large_sides(self):
+        big = 2**31
+        r = dnd.roll.Roll([1, big, big + 1], 1, 0)
+        self.assertEqual(r.result, 2 * big + 1)
+        self.assertEqual(list(r.values), [big, big + 1])
+        rng = dnd.rng.RandomSource.seeded(1)
+        dice = dnd.roll.Dice(3, 3000000000)
+        for _ in range(20):
+            r = dice.roll(rng)
+            self.assertEqual(r.result, sum(r.values))
+        rolls = dnd.roll.Dice(2, 2**63, 1).roll_many(20, keep=True, rng=rng)
+        self.assertEqual(rolls[3], rolls.roll(3).result)
+        self.assertTrue(all(1 <= t <= 2**63 for t in rolls))
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            dnd.roll.Roll([1], 0, 0).extra = 1
+        with self.assertRaises(AttributeError):
+            dnd.roll.Dice(1, 6).extra = 1
+
+
+class TestDiceRollMany(unittest.TestCase):
+    def setUp(self):
+        random.seed(1234)
+
+    def test_roll_many_length(self):
+        rolls = dnd.roll.Dice(3, 6).roll_many(100)
+        self.assertEqual(len(rolls), 100)
+        self.assertEqual(len(rolls.totals), 100)
+        self.assertIsNone(rolls.dice)
+
+    def test_roll_many_bounds(self):
+        rolls = dnd.roll.Dice(3, 6).roll_many(1000)
+        self.assertTrue(all(3 <= t <= 18 for t in rolls))
+        self.assertEqual(min(rolls), 3)
+        self.assertEqual(max(rolls), 18)
+
+    def test_roll_many_zero(self):
+        self.assertEqual(len(dnd.roll.Dice(3, 6).roll_many(0)), 0)
+        self.assertEqual(list(dnd.roll.Dice(0, 6).roll_many(3)), [0, 0, 0])
+
+    def test_roll_many_keep(self):
+        rolls = dnd.roll.Dice(4, 6, 1).roll_many(50, keep=True)
+        self.assertEqual(len(rolls.dice), 200)
+        for i in range(len(rolls)):
+            dice = list(rolls.dice[i * 4 : i * 4 + 4])
+            self.assertEqual(dice, sorted(dice))
+            self.assertEqual(rolls[i], sum(dice[1:]))
+
+    def test_roll_many_drop(self):
+        rolls = dnd.roll.Dice(4, 6, 1, 1).roll_many(1000)
+        self.assertTrue(all(2 <= t <= 12 for t in rolls))
+
+    def test_roll_many_drop_all(self):
+        for dice in (dnd.roll.Dice(3, 6, 0, 5), dnd.roll.Dice(3, 6, 2, 2)):
+            self.assertEqual(list(dice.roll_many(20)), [0] * 20)
+            rolls = dice.roll_many(5, keep=True)
+            self.assertEqual([rolls.roll(i).result for i in range(5)], [0] * 5)
+
+    def test_roll_many_roll(self):
+        rolls = dnd.roll.Dice(4, 6, 1).roll_many(10, keep=True)
+        for i in range(len(rolls)):
+            r = rolls.roll(i)
+            self.assertEqual(r.result, rolls[i])
+            self.assertEqual(len(list(r.dropped_low)), 1)
+        self.assertEqual(rolls.roll(-1).result, rolls[9])
+
+    def test_roll_many_roll_not_kept(self):
+        rolls = dnd.roll.Dice(4, 6, 1).roll_many(10)
+        with self.assertRaises(ValueError):
+            rolls.roll(0)
+
+
+class TestDiceRollHistogram(unittest.TestCase):
+    def setUp(self):
+        random.seed(1234)
+
+    def test_roll_histogram_counts(self):
+        r = dnd.roll.Dice(1000, 6).roll_histogram()
+        self.assertEqual(len(r.counts), 6)
+        self.assertEqual(sum(r.counts), 1000)
+        self.assertEqual(r.result, sum(v * c for v, c in enumerate(r.counts, 1)))
+
+    def test_roll_histogram_bounds(self):
+        d = dnd.roll.Dice(4, 6, 1)
+        for _ in range(1000):
+            self.assertTrue(3 <= d.roll_histogram().result <= 18)
+
+    def test_roll_histogram_views(self):
+        r = dnd.roll.HistogramRoll([0, 2, 1, 2, 2, 1], 2, 1)
+        self.assertEqual(r.result, 21)
+        self.assertEqual(list(r.dropped_low), [2, 2])
+        self.assertEqual(list(r.values), [3, 4, 4, 5, 5])
+        self.assertEqual(list(r.dropped_high), [6])
+        self.assertEqual(str(r), "21 = [[2, 2], [3, 4, 4, 5, 5], [6]]")
+
+    def test_roll_histogram_matches_roll(self):
+        values = [1, 1, 2, 4, 4, 6]
+        counts = [values.count(v) for v in range(1, 7)]
+        for lo, hi in ((0, 0), (1, 0), (0, 2), (2, 2), (4, 4), (7, 0)):
+            r = dnd.roll.Roll(values, lo, hi)
+            h = dnd.roll.HistogramRoll(counts, lo, hi)
+            self.assertEqual(h.result, r.result)
+            self.assertEqual(list(h.values), list(r.values))
+            self.assertEqual(list(h.dropped_low), list(r.dropped_low))
+            self.assertEqual(list(h.dropped_high), list(r.dropped_high))
+
+    def test_binomial_edges(self):
+        rng = dnd.rng.default
+        self.assertEqual(dnd.roll._binomial(10, 0.0, rng), 0)
+        self.assertEqual(dnd.roll._binomial(10, 1.0, rng), 10)
+        for n, p in ((5, 0.5), (20, 0.2), (1000, 0.3), (1000, 0.9)):
+            self.assertTrue(0 <= dnd.roll._binomial(n, p, rng) <= n)
+
+
+class TestDiceRng(unittest.TestCase):
+    def test_roll_seeded(self):
+        d = dnd.roll.Dice(4, 6, 1)
+        a = [d.roll(dnd.rng.RandomSource.seeded(7)).result for _ in range(5)]
+        b = [d(dnd.rng.RandomSource.seeded(7)).result for _ in range(5)]
+        self.assertEqual(a, b)
+
+    def test_roll_many_seeded(self):
+        d = dnd.roll.Dice(3, 8)
+        a = d.roll_many(100, rng=dnd.rng.RandomSource.seeded(7))
+        b = d.roll_many(100, rng=dnd.rng.RandomSource.seeded(7))
+        self.assertEqual(list(a), list(b))
+
+    def test_roll_histogram_seeded(self):
+        d = dnd.roll.Dice(500, 6, 5)
+        a = d.roll_histogram(dnd.rng.RandomSource.seeded(7))
+        b = d.roll_histogram(dnd.rng.RandomSource.seeded(7))
+        self.assertEqual(a.counts, b.counts)
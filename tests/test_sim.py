@@ -0,0 +1,52 @@
+import unittest
+
+import dnd.parse
+import dnd.sim
+import dnd.table
+
+
+class TestSimulate(unittest.TestCase):
+    def test_expression(self):
+        summary = dnd.sim.simulate(dnd.parse.expression("2d6"), 2000, seed=1)
+        self.assertEqual(summary.samples, 2000)
+        self.assertEqual(summary.seed, 1)
+        self.assertEqual(summary.min(), 2)
+        self.assertEqual(summary.max(), 12)
+        self.assertAlmostEqual(summary.mean(), 7.0, delta=0.3)
+
+    def test_reproducible(self):
+        node = dnd.parse.expression("1d20 + 3")
+        a = dnd.sim.simulate(node, 1000, seed=5, workers=1, shard_size=100)
+        b = dnd.sim.simulate(node, 1000, seed=5, workers=1, shard_size=100)
+        self.assertEqual(a.histogram, b.histogram)
+
+    def test_independent_of_workers(self):
+        node = dnd.parse.expression("3d6")
+        a = dnd.sim.simulate(node, 1000, seed=9, workers=1, shard_size=250)
+        b = dnd.sim.simulate(node, 1000, seed=9, workers=2, shard_size=250)
+        self.assertEqual(a.histogram, b.histogram)
+
+    def test_table(self):
+        tables = {
+            "coin": dnd.table.Table(
+                "coin", [dnd.table.Row(1, "heads"), dnd.table.Row(1, "tails")]
+            )
+        }
+        summary = dnd.sim.simulate("coin", 500, tables, seed=3, workers=1)
+        self.assertEqual(set(summary.histogram), {"heads", "tails"})
+        self.assertEqual(summary.samples, 500)
+
+    def test_missing_table(self):
+        with self.assertRaises(ValueError):
+            dnd.sim.simulate("missing", 10, {})
+
+    def test_no_samples(self):
+        node = dnd.parse.expression("1d6")
+        for samples in (0, -5):
+            with self.assertRaises(ValueError):
+                dnd.sim.simulate(node, samples, seed=1)
+
+    def test_derive_seed(self):
+        self.assertEqual(dnd.sim.derive_seed(1, 0), dnd.sim.derive_seed(1, 0))
+        self.assertNotEqual(dnd.sim.derive_seed(1, 0), dnd.sim.derive_seed(1, 1))
+        self.assertNotEqual(dnd.sim.derive_seed(1, 0), dnd.sim.derive_seed(2, 0))
@@ -0,0 +1,67 @@
+import unittest
+
+import dnd.nodes
+import dnd.parse
+import dnd.roll
+import dnd.simplify
+
+
+def _simplify(expr):
+    return dnd.simplify.simplify(dnd.parse.expression(expr, simplify=False))
+
+
+class TestSimplify(unittest.TestCase):
+    def test_fold_constants(self):
+        node = _simplify("2 + 3 * 4")
+        self.assertIs(type(node), dnd.nodes.Value)
+        self.assertEqual(node.value, 14)
+
+    def test_fold_float_order(self):
+        self.assertEqual(_simplify("0.1 + 0.2 + 0.3").value, 0.1 + 0.2 + 0.3)
+
+    def test_fold_constant_subtree(self):
+        self.assertEqual(str(_simplify("2 + 3 * 4 + 1d6")), "1d6 + 14")
+        self.assertEqual(str(_simplify("1d6 * (2 + 3)")), "1d6 * 5")
+
+    def test_double_negation(self):
+        self.assertEqual(str(_simplify("--1d8")), "1d8")
+        self.assertEqual(str(_simplify("-(-(1d8 * 2))")), "1d8 * 2")
+        self.assertEqual(_simplify("-3").value, -3)
+
+    def test_merge_dice(self):
+        self.assertEqual(str(_simplify("1d6 + 1d6")), "2d6")
+        self.assertEqual(str(_simplify("1d6 + 2 + 1d6 - 3")), "2d6 - 1")
+        self.assertEqual(str(_simplify("1d6 + 1d4 + 2d6")), "3d6 + 1d4")
+        self.assertEqual(str(_simplify("-1d6 - 1d6")), "-(2d6)")
+
+    def test_no_merge(self):
+        self.assertEqual(str(_simplify("1d6 - 1d6")), "1d6 - 1d6")
+        node = dnd.nodes.Add(
+            dnd.nodes.Dice(dnd.roll.Dice(4, 6, 1)),
+            dnd.nodes.Dice(dnd.roll.Dice(4, 6, 1)),
+        )
+        self.assertEqual(str(dnd.simplify.simplify(node)), "4d6L1 + 4d6L1")
+
+    def test_identities(self):
+        self.assertEqual(str(_simplify("1d6 + 0")), "1d6")
+        self.assertEqual(str(_simplify("1d6 * 1")), "1d6")
+        self.assertEqual(str(_simplify("1 * 1d6")), "1d6")
+        self.assertEqual(str(_simplify("1d6 ** 1")), "1d6")
+        self.assertEqual(str(_simplify("1d6 * 1.0")), "1d6 * 1.0")
+
+    def test_errors_not_folded(self):
+        node = _simplify("1 / 0")
+        self.assertIs(type(node), dnd.nodes.Divide)
+        with self.assertRaises(ZeroDivisionError):
+            node()
+
+    def test_large_power_not_folded(self):
+        self.assertIs(type(_simplify("2 ** 100000")), dnd.nodes.Power)
+
+    def test_distribution_preserved(self):
+        for expr in ("1d6 + 1d6 + 3", "2 - 1d4 - 1d4 - 5", "-(1d4 + 1) + 2"):
+            raw = dnd.parse.expression(expr, simplify=False)
+            node = dnd.simplify.simplify(raw)
+            self.assertEqual((node.min(), node.max()), (raw.min(), raw.max()))
+            self.assertAlmostEqual(node.mean(), raw.mean())
+            self.assertAlmostEqual(node.variance(), raw.variance())
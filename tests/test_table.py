@@ -0,0 +1,361 @@
+import collections
+import json
+import os.path
+import tempfile
+import unittest
+
+import dnd.err
+import dnd.rng
+import dnd.table
+
+
+def _write(dirname, filename, tables, references=None):
+    data = {"default": next(iter(tables)), "tables": tables}
+    if references is not None:
+        data["references"] = references
+    with open(os.path.join(dirname, filename), "w") as fp:
+        json.dump(data, fp)
+    return os.path.join(dirname, filename)
+
+
+class TestLink(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.dirname = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_load_links_references(self):
+        colors = [{"desc": "red"}, {"desc": "blue"}]
+        _write(self.dirname, "other.json", {"color": colors})
+        path = _write(
+            self.dirname,
+            "main.json",
+            {"thing": [{"desc": "a {{color}} {{name}}"}]},
+            references=["other.json"],
+        )
+        default, tables = dnd.table.Table.load(path, variables={"name"})
+        self.assertEqual(default, "thing")
+        parts = tables["thing"][0].template._parts
+        self.assertIs(parts[1][1], tables["color"])
+        # Linked tables do not need to be passed to evaluate
+        only = {"thing": tables["thing"]}
+        result = dnd.table.Table.evaluate("thing", {"name": "box"}, only)
+        self.assertIn(result, ("a red box", "a blue box"))
+
+    def test_unlinked_by_default(self):
+        tables = {"greeting": [{"desc": "Hello {{hero}}"}], "hero": [{"desc": "x"}]}
+        path = _write(self.dirname, "main.json", tables)
+        _, tables = dnd.table.Table.load(path)
+        self.assertEqual(tables["greeting"][0].template._parts[1], (2, "hero"))
+        result = dnd.table.Table.evaluate("greeting", {"hero": "Bob"}, tables)
+        self.assertEqual(result, "Hello Bob")
+        self.assertEqual(dnd.table.Table.evaluate("greeting", None, tables), "Hello x")
+
+    def test_unresolved(self):
+        path = _write(self.dirname, "main.json", {"thing": [{"desc": "{{nope}}"}]})
+        with self.assertRaises(dnd.err.JsonError) as ctx:
+            dnd.table.Table.load(path, dnd.err.Raiser(), ())
+        self.assertEqual(ctx.exception.jsonpath, ".tables.thing[0].desc")
+        self.assertIn("'nope'", str(ctx.exception))
+
+        tables = {"thing": dnd.table.Table("thing", [dnd.table.Row(1, "{{x}}")])}
+        self.assertEqual(dnd.table.Table.link(tables), [("thing", 0, "x")])
+        self.assertEqual(dnd.table.Table.link(tables, {"x"}), [])
+
+    def test_error_path_restored(self):
+        errh = dnd.err.Raiser()
+        path = _write(self.dirname, "bad.json", {"thing": [{"desc": "{{nope}}"}]})
+        with self.assertRaises(dnd.err.JsonError):
+            dnd.table.Table.load(path, errh, ())
+        path = _write(self.dirname, "loop.json", {"loop": [{"desc": "{{loop}}"}]})
+        with self.assertRaises(dnd.err.JsonError):
+            dnd.table.Table.load(path, errh)
+        path = os.path.join(self.dirname, "nodefault.json")
+        with open(path, "w") as fp:
+            json.dump({"tables": {}}, fp)
+        with self.assertRaises(dnd.err.JsonError) as ctx:
+            dnd.table.Table.load(path, errh)
+        self.assertEqual(ctx.exception.jsonpath, ".")
+
+
+class TestNonterminating(unittest.TestCase):
+    def test_cycles(self):
+        Row, Table = dnd.table.Row, dnd.table.Table
+        tables = {
+            "loop": Table("loop", [Row(1, "{{loop}}")]),
+            "a": Table("a", [Row(1, "{{b}}"), Row(0, "end")]),
+            "b": Table("b", [Row(1, "x {{a}}")]),
+            "maybe": Table("maybe", [Row(1, "{{maybe}}"), Row(1, "{{leaf}}")]),
+            "leaf": Table("leaf", [Row(1, "leaf")]),
+            "uses": Table("uses", [Row(1, "{{leaf}} {{a}}"), Row(1, "{{maybe}}")]),
+        }
+        self.assertEqual(Table.nonterminating(tables), ["loop", "a", "b"])
+        Table.link(tables)
+        self.assertEqual(Table.nonterminating(tables), ["loop", "a", "b"])
+
+    def test_unweighted(self):
+        Row, Table = dnd.table.Row, dnd.table.Table
+        tables = {
+            "a": Table("a", [Row(0, "x")]),
+            "top": Table("top", [Row(1, "{{a}}!")]),
+            "loop": Table("loop", [Row(0, "{{loop}}"), Row(0, "x")]),
+        }
+        self.assertEqual(Table.nonterminating(tables), ["loop"])
+        Table.link(tables)
+        self.assertEqual(tables["top"][0].template.evaluate(tables=tables), "x!")
+
+    def test_reported_on_load(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            path = _write(dirname, "main.json", {"loop": [{"desc": "{{loop}}"}]})
+            with self.assertRaises(dnd.err.JsonError) as ctx:
+                dnd.table.Table.load(path, dnd.err.Raiser())
+        self.assertEqual(ctx.exception.jsonpath, ".tables.loop")
+
+
+class TestInline(unittest.TestCase):
+    def test_inline(self):
+        Row, Table = dnd.table.Row, dnd.table.Table
+        tables = {
+            "top": Table("top", [Row(1, "a {{one}} b"), Row(1, "{{same}}{{2 + 3}}")]),
+            "one": Table("one", [Row(1, "<{{two}}>")]),
+            "two": Table("two", [Row(1, "{{rand}}")]),
+            "rand": Table("rand", [Row(1, "x"), Row(1, "y")]),
+            "same": Table("same", [Row(1, "s"), Row(2, "s")]),
+        }
+        Table.link(tables)
+        self.assertGreater(Table.inline(tables), 0)
+        top = tables["top"]
+        self.assertEqual(top[0].template._parts[0], (0, "a <"))
+        self.assertIs(top[0].template._parts[1][1], tables["rand"])
+        self.assertEqual(top[0].template._parts[2], (0, "> b"))
+        self.assertEqual(top[1].template._parts, [(0, "s5")])
+        self.assertEqual(Table.inline(tables), 0)
+
+    def test_changed(self):
+        Row, Table = dnd.table.Row, dnd.table.Table
+        tables = {
+            "top": Table("top", [Row(1, "a {{one}} box")]),
+            "one": Table("one", [Row(1, "{{two}}")]),
+            "two": Table("two", [Row(1, "red")]),
+        }
+        Table.link(tables)
+        Table.inline(tables)
+        top = tables["top"][0].template
+        self.assertEqual(top._parts, [(0, "a red box")])
+        tables["two"].append(Row(1, "blue"))
+        tables["two"].set_weight(0, 0)
+        self.assertEqual(top._parts[1], (3, tables["one"]))
+        self.assertEqual(top.evaluate(), "a blue box")
+        self.assertEqual(tables["one"][0].template.evaluate(), "blue")
+        tables["one"].remove(0)
+        self.assertEqual(Table.inline(tables), 0)
+
+    def test_exclude(self):
+        Row, Table = dnd.table.Row, dnd.table.Table
+        tables = {"loop": Table("loop", [Row(1, "a{{loop}}")])}
+        Table.link(tables)
+        self.assertEqual(Table.inline(tables, Table.nonterminating(tables)), 0)
+
+
+class _Counter(dnd.rng.Source):
+    """A source which returns every integer in turn"""
+
+    def __init__(self):
+        self.next = 0
+
+    def randint(self, a, b):
+        value = a + self.next % (b - a + 1)
+        self.next += 1
+        return value
+
+
+class TestAlias(unittest.TestCase):
+    def test_exact_integer_weights(self):
+        weights = [3, 0, 1, 7, 2, 2]
+        alias = dnd.table.Alias(weights)
+        rng = _Counter()
+        n = len(weights) * sum(weights)
+        counts = collections.Counter(alias.draw(rng) for _ in range(n))
+        self.assertEqual(
+            counts, {i: w * len(weights) for i, w in enumerate(weights) if w > 0}
+        )
+
+    def test_float_weights(self):
+        alias = dnd.table.Alias([0.5, 1.5, 0.0, 2.0])
+        rng = dnd.rng.RandomSource.seeded(1)
+        counts = collections.Counter(alias.draw(rng) for _ in range(40000))
+        self.assertNotIn(2, counts)
+        for i, p in ((0, 0.125), (1, 0.375), (3, 0.5)):
+            self.assertAlmostEqual(counts[i] / 40000, p, delta=0.01)
+
+    def test_no_weight(self):
+        alias = dnd.table.Alias([0, 0, 0])
+        rng = dnd.rng.RandomSource.seeded(1)
+        self.assertEqual(set(alias.draw(rng) for _ in range(100)), {0})
+        with self.assertRaises(ValueError):
+            dnd.table.Alias([])
+
+    def test_invalidated(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(1, "a")])
+        rng = dnd.rng.RandomSource.seeded(1)
+        self.assertEqual(table.random(rng).description, "a")
+        table.append(Row(1000, "b"))
+        self.assertEqual(table.random(rng).description, "b")
+        table.extend([Row(0, "c"), Row(1000000, "d")])
+        self.assertEqual(table.random(rng).description, "d")
+
+
+class TestFenwick(unittest.TestCase):
+    def test_exact_integer_weights(self):
+        weights = [3, 0, 1, 7, 2]
+        tree = dnd.table.Fenwick(weights)
+        rng = _Counter()
+        counts = collections.Counter(tree.draw(rng) for _ in range(sum(weights)))
+        self.assertEqual(counts, {i: w for i, w in enumerate(weights) if w > 0})
+
+    def test_set(self):
+        tree = dnd.table.Fenwick([1, 2, 3])
+        tree.set(1, 0.5)
+        tree.set(2, 0)
+        self.assertEqual((tree.total, tree.get(1)), (1.5, 0.5))
+        rng = dnd.rng.RandomSource.seeded(1)
+        counts = collections.Counter(tree.draw(rng) for _ in range(30000))
+        self.assertNotIn(2, counts)
+        self.assertAlmostEqual(counts[0] / 30000, 2 / 3, delta=0.01)
+        tree.set(0, -1)
+        self.assertEqual((tree.total, tree.get(0)), (0.5, 0))
+
+    def test_negative_weights(self):
+        tree = dnd.table.Fenwick([2, -1, 1])
+        self.assertEqual((tree.total, tree.get(1)), (3, 0))
+        rng = _Counter()
+        counts = collections.Counter(tree.draw(rng) for _ in range(3))
+        self.assertEqual(counts, {0: 2, 2: 1})
+
+    def test_draw_range(self):
+        class Ranges(_Counter):
+            def __init__(self):
+                super().__init__()
+                self.ranges = set()
+
+            def randint(self, a, b):
+                self.ranges.add((a, b))
+                return super().randint(a, b)
+
+        tree = dnd.table.Fenwick([100] * 10)
+        rng = Ranges()
+        for i in range(1000):
+            tree.set(tree.draw(rng), tree.get(i % 10) - 1 if i % 2 else 100)
+        self.assertLessEqual(len(rng.ranges), 2)
+
+    def test_find(self):
+        tree = dnd.table.Fenwick([2, 0, 3, 1])
+        found = [tree.find(v) for v in range(6)]
+        self.assertEqual(found, [0, 0, 2, 2, 2, 3])
+        self.assertEqual(tree.draw(_Counter()), 0)
+        self.assertEqual(dnd.table.Fenwick([0, 0]).draw(_Counter()), 0)
+
+
+class TestMutableWeights(unittest.TestCase):
+    def test_deplete(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("loot", [Row(2, "gem"), Row(1, "sword")])
+        rng = dnd.rng.RandomSource.seeded(1)
+        drawn = list()
+        for _ in range(3):
+            row = table.random(rng)
+            drawn.append(row.description)
+            table.decrement(0 if row.description == "gem" else 1)
+        self.assertEqual(sorted(drawn), ["gem", "gem", "sword"])
+        self.assertEqual(table.weight, 0)
+        self.assertEqual(table.decrement(0), 0)
+
+    def test_set_weight(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(1, "a"), Row(1, "b")])
+        rng = dnd.rng.RandomSource.seeded(1)
+        table.set_weight(-2, 0)
+        self.assertEqual(table[0].weight, 0)
+        self.assertEqual(set(table.random(rng).description for _ in range(50)), {"b"})
+        table.set_weight(0, -1)
+        self.assertEqual((table[0].weight, table.weight), (-1, 0))
+        with self.assertRaises(IndexError):
+            table.set_weight(2, 1)
+
+    def test_negative_row(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(1, "a"), Row(-1, "b"), Row(1, "c")])
+        table.set_weight(2, 2)
+        self.assertEqual((table[2].weight, table.weight), (2, 2))
+        rng = dnd.rng.RandomSource.seeded(1)
+        drawn = set(table.random(rng).description for _ in range(50))
+        self.assertEqual(drawn, {"a", "c"})
+
+    def test_remove(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(1, "a"), Row(2, "b"), Row(1, "c")])
+        table.set_weight(2, 0)
+        self.assertEqual(table.remove(1).description, "b")
+        self.assertEqual((len(table), table.weight), (2, 1))
+        rng = dnd.rng.RandomSource.seeded(1)
+        self.assertEqual(set(table.random(rng).description for _ in range(50)), {"a"})
+
+
+class TestSample(unittest.TestCase):
+    def test_exact_integer_weights(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(2, "a"), Row(0, "b"), Row(3, "c")])
+        self.assertEqual(table.sample(10, _Counter()), [0, 0, 2, 2, 2] * 2)
+        self.assertEqual(table.sample_counts(10, _Counter()), [4, 0, 6])
+        self.assertEqual(table.sample(0), [])
+
+    def test_float_weights(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(0.5, "a"), Row(1.5, "b"), Row(0, "c")])
+        counts = table.sample_counts(40000, dnd.rng.RandomSource.seeded(1))
+        self.assertEqual(counts[2], 0)
+        self.assertAlmostEqual(counts[0] / 40000, 0.25, delta=0.01)
+
+    def test_negative_weight(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(2, "a"), Row(-1, "b"), Row(1, "c")])
+        self.assertEqual(table.sample(6, _Counter()), [0, 0, 2] * 2)
+        table = dnd.table.Table("t", [Row(0.5, "a"), Row(-1, "b"), Row(1, "c")])
+        counts = table.sample_counts(1000, dnd.rng.RandomSource.seeded(1))
+        self.assertEqual(counts[1], 0)
+
+    def test_no_weight(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(0, "a"), Row(0, "b")])
+        self.assertEqual(table.sample(3), [0, 0, 0])
+        table.set_weight(1, 1)
+        self.assertEqual(table.sample(3), [1, 1, 1])
+        with self.assertRaises(ValueError):
+            dnd.table.Table("empty", []).sample(1)
+
+
+class TestSampleDistinct(unittest.TestCase):
+    def test_distinct(self):
+        Row = dnd.table.Row
+        rows = [Row(i % 4, str(i)) for i in range(40)]
+        table = dnd.table.Table("t", rows)
+        rng = dnd.rng.RandomSource.seeded(1)
+        drawn = table.sample_distinct(30, rng)
+        self.assertEqual(len(set(id(r) for r in drawn)), 30)
+        self.assertTrue(all(r.weight > 0 for r in drawn))
+        self.assertEqual(table.sample_distinct(0, rng), [])
+        with self.assertRaises(ValueError):
+            table.sample_distinct(31, rng)
+
+    def test_weighted_order(self):
+        Row = dnd.table.Row
+        table = dnd.table.Table("t", [Row(1, "a"), Row(3, "b"), Row(0, "c")])
+        rng = dnd.rng.RandomSource.seeded(1)
+        firsts = collections.Counter(
+            table.sample_distinct(2, rng)[0].description for _ in range(20000)
+        )
+        self.assertEqual(set(firsts), {"a", "b"})
+        self.assertAlmostEqual(firsts["b"] / 20000, 0.75, delta=0.015)
@@ -0,0 +1,183 @@
+import io
+import unittest
+
+import dnd.parse
+import dnd.rng
+import dnd.roll
+import dnd.table
+import dnd.template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_parts(self):
+        t = dnd.template.Template("a {{ 1d6 }} b {{name}}{{2}}c")
+        kinds = [k for k, _ in t._parts]
+        self.assertEqual(kinds, [0, 1, 0, 2, 1, 0])
+        self.assertEqual(t._parts[0], (0, "a "))
+        self.assertEqual(t._parts[3], (2, "name"))
+        self.assertEqual(t._parts[-1], (0, "c"))
+
+    def test_plain_text(self):
+        self.assertEqual(dnd.template.Template("plain")._parts, [(0, "plain")])
+        self.assertEqual(dnd.template.Template("")._parts, [])
+        self.assertEqual(dnd.template.Template("a } b { c").evaluate(), "a } b { c")
+
+    def test_evaluate(self):
+        t = dnd.template.Template("{{x}} has {{2 + 3}} gold")
+        self.assertEqual(t.evaluate({"x": "Bob"}), "Bob has 5 gold")
+
+    def test_malformed(self):
+        cases = [
+            ("a {{ 1d6", "unclosed '{{'", 2),
+            ("a }} b", "unmatched '}}'", 2),
+            ("{{ a {{ b }}", "unexpected '{{' in statement", 5),
+        ]
+        for text, message, position in cases:
+            with self.assertRaises(dnd.template.TemplateError) as ctx:
+                dnd.template.Template(text)
+            self.assertEqual(ctx.exception.message, message)
+            self.assertEqual(ctx.exception.position, position)
+            self.assertIsInstance(ctx.exception, ValueError)
+            self.assertIn("position {}".format(position), str(ctx.exception))
+
+    def test_render_into(self):
+        inner = dnd.table.Table("inner", [dnd.table.Row(1, "{{x}}!")])
+        tables = {"inner": inner}
+        t = dnd.template.Template("a {{inner}} b")
+        parts = list()
+        t.render_into(parts, {"x": "y"}, tables)
+        self.assertEqual(parts, ["a ", "y", "!", " b"])
+
+        stream = io.StringIO()
+        dnd.table.Table.render_into("inner", stream, {"x": 3}, tables)
+        t.render_into(stream, {"x": "z"}, tables)
+        self.assertEqual(stream.getvalue(), "3!a z! b")
+        self.assertEqual(t.evaluate({"x": "w"}, tables), "a w! b")
+
+    def test_link(self):
+        inner = dnd.table.Table("inner", [dnd.table.Row(1, "in")])
+        t = dnd.template.Template("{{inner}} {{x}} {{missing}} {{1d1}}")
+        unresolved = t.link({"inner": inner}, variables={"x"})
+        self.assertEqual(unresolved, ["missing"])
+        self.assertEqual([k for k, _ in t._parts], [3, 0, 4, 0, 2, 0, 1])
+        self.assertIs(t._parts[0][1], inner)
+
+        t.ignore_on_error()
+        self.assertEqual(t.evaluate({"x": 5}), "in 5 <ERROR> 1")
+        self.assertEqual(t.evaluate({"x": "a", "missing": "b"}), "in a b 1")
+        self.assertEqual(t.evaluate(), "in <ERROR> <ERROR> 1")
+        t.raise_on_error()
+        with self.assertRaises(ValueError):
+            t.evaluate({"missing": 1})
+
+    def test_callable_values_use_rng(self):
+        values = {
+            "d": dnd.roll.Dice(3, 6),
+            "n": dnd.parse.expression("1d20 + 1"),
+            "s": "text",
+        }
+        rng = dnd.rng.RandomSource.seeded(5)
+        expected = "{} {} text".format(values["d"](rng), values["n"](rng))
+        t = dnd.template.Template("{{d}} {{n}} {{s}}")
+        for variables in (None, {"d", "n", "s"}):
+            if variables is not None:
+                t.link({}, variables)
+            rng = dnd.rng.RandomSource.seeded(5)
+            self.assertEqual(t.evaluate(values, rng=rng), expected)
+
+    def test_link_precedence(self):
+        inner = dnd.table.Table("inner", [dnd.table.Row(1, "in")])
+        t = dnd.template.Template("{{inner}}")
+        self.assertEqual(t.evaluate({"inner": "value"}, {"inner": inner}), "value")
+        # Values which are not listed as variables do not replace linked tables
+        t.link({"inner": inner})
+        self.assertEqual(t.evaluate({"inner": "value"}), "in")
+        t = dnd.template.Template("{{inner}}")
+        t.link({"inner": inner}, {"inner"})
+        self.assertEqual(t.evaluate({"inner": "value"}), "value")
+
+
+def _chain(n, text="x{{t%d}}y"):
+    tables = dict()
+    for i in range(n):
+        desc = text % (i + 1) if i + 1 < n else "end"
+        tables["t%d" % i] = dnd.table.Table("t%d" % i, [dnd.table.Row(1, desc)])
+    dnd.table.Table.link(tables)
+    return tables
+
+
+class TestExpansion(unittest.TestCase):
+    def test_deep_chain(self):
+        tables = _chain(5000)
+        result = dnd.table.Table.evaluate("t0", None, tables)
+        self.assertEqual(result, "x" * 4999 + "end" + "y" * 4999)
+
+    def test_tail_chain(self):
+        tables = _chain(20000, "{{t%d}}")
+        self.assertEqual(dnd.table.Table.evaluate("t0", None, tables), "end")
+
+    def test_depth_limit(self):
+        tables = _chain(50)
+        t = dnd.template.Template("{{t0}}")
+        with self.assertRaises(dnd.template.ExpansionError):
+            t.render_into(list(), None, tables, max_depth=10)
+        parts = list()
+        t.render_into(parts, None, tables, max_depth=50)
+        self.assertEqual("".join(parts), "x" * 49 + "end" + "y" * 49)
+
+    def test_expansion_limit(self):
+        tables = _chain(50, "{{t%d}}")
+        t = dnd.template.Template("{{t0}}")
+        with self.assertRaises(dnd.template.ExpansionError):
+            t.render_into(list(), None, tables, max_expansions=49)
+        self.assertEqual(t.evaluate(None, tables), "end")
+
+    def test_self_reference(self):
+        loop = dnd.table.Table("loop", [dnd.table.Row(1, "a{{loop}}")])
+        tables = {"loop": loop}
+        with self.assertRaises(dnd.template.ExpansionError):
+            dnd.table.Table.evaluate("loop", None, tables)
+        dnd.table.Table.link(tables)
+        with self.assertRaises(dnd.template.ExpansionError):
+            dnd.table.Table.evaluate("loop", None, tables)
+
+    def test_errors_use_nested_template(self):
+        inner = dnd.table.Table("inner", [dnd.table.Row(1, "{{nope}}!")])
+        t = dnd.template.Template("a {{inner}} b")
+        t.ignore_on_error()
+        with self.assertRaises(ValueError):
+            t.evaluate(None, {"inner": inner})
+        inner[0].template.ignore_on_error()
+        self.assertEqual(t.evaluate(None, {"inner": inner}), "a <ERROR>! b")
+
+
+class TestEvaluateMany(unittest.TestCase):
+    def test_template(self):
+        t = dnd.template.Template("{{x}}: {{1d6}}")
+        results = t.evaluate_many(100, {"x": "a"}, rng=dnd.rng.RandomSource.seeded(2))
+        self.assertNotIsInstance(results, list)
+        results = list(results)
+        self.assertEqual(len(results), 100)
+        self.assertEqual(set(results), set("a: {}".format(i) for i in range(1, 7)))
+
+    def test_table_matches_evaluate(self):
+        tables = {
+            "top": dnd.table.Table(
+                "top", [dnd.table.Row(1, "{{mid}}!"), dnd.table.Row(2, "{{1d4}}")]
+            ),
+            "mid": dnd.table.Table(
+                "mid", [dnd.table.Row(1, "a"), dnd.table.Row(1, "b {{x}}")]
+            ),
+        }
+        values = {"x": "y"}
+        rng = dnd.rng.RandomSource.seeded(4)
+        expected = [
+            dnd.table.Table.evaluate("top", values, tables, rng) for _ in range(50)
+        ]
+        rng = dnd.rng.RandomSource.seeded(4)
+        results = dnd.table.Table.evaluate_many("top", 50, values, tables, rng)
+        self.assertEqual(list(results), expected)
+
+    def test_missing_table(self):
+        with self.assertRaises(ValueError):
+            dnd.table.Table.evaluate_many("nope", 10, None, {})